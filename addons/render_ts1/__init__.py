@@ -24,14 +24,22 @@ if "bpy" in locals():
 
 import bmesh  #  noqa E402
 import bpy  #  noqa E402
-import bpy_extras  #  noqa E402
+import bpy_extras.anim_utils  #  noqa E402
+import concurrent.futures  #  noqa E402
 import copy  #  noqa E402
+import hashlib  #  noqa E402
 import json  #  noqa E402
 import math  #  noqa E402
 import mathutils  #  noqa E402
+import numpy  #  noqa E402
 import os  #  noqa E402
 import shutil  #  noqa E402
 import subprocess  #  noqa E402
+import tempfile  #  noqa E402
+import time  #  noqa E402
+
+from . import history  #  noqa E402
+from . import timing  #  noqa E402
 
 
 class TS1R_addon_preferences(bpy.types.AddonPreferences):
@@ -53,10 +61,18 @@ class TS1R_addon_preferences(bpy.types.AddonPreferences):
         default="",
     )
 
+    history_path: bpy.props.StringProperty(
+        name="Performance History Path",
+        description="Path to the SQLite database of past render runs. Defaults to one in the Blender user data files",
+        subtype='FILE_PATH',
+        default="",
+    )
+
     def draw(self, _: bpy.context) -> None:
         """Draw the addon preferences ui."""
         self.layout.prop(self, "the_sims_path")
         self.layout.prop(self, "compiler_path")
+        self.layout.prop(self, "history_path")
 
 
 class TS1R_OT_set_view_north_west(bpy.types.Operator):
@@ -448,332 +464,2887 @@ class TS1R_OT_setup(bpy.types.Operator):
         return {'FINISHED'}
 
 
-def render_color_and_alpha(context, direction, rotation, output_dir):
-    bpy.ops.render.render(animation=False)
+def renderer_output_nodes(context):
+    if bpy.app.version[0] >= 5:
+        scene_node_tree = context.scene.compositing_node_group
+    else:
+        scene_node_tree = context.scene.node_tree
+
+    render_group_node_tree = scene_node_tree.nodes.get("The Sims Renderer").node_tree
+
+    return {
+        "color": render_group_node_tree.nodes.get("The Sims Color Output"),
+        "alpha": render_group_node_tree.nodes.get("The Sims Alpha Output"),
+        "depth": render_group_node_tree.nodes.get("The Sims Depth Output"),
+        "extra_depth": scene_node_tree.nodes.get("The Sims Depth Extra Output"),
+    }
+
+
+def set_output_file_name(output_node, file_name):
+    if bpy.app.version[0] >= 5:
+        output_node.file_name = file_name
+    else:
+        output_node.file_slots[0].path = file_name
+
+
+def move_output(context, output_dir, file_name, extension):
+    with timing.stage("file_move", file_name=file_name + extension) as stage:
+        # file output nodes append the frame number to the file name
+        written_file_name = file_name + "%.4d" % context.scene.frame_current
+        for written_extension in (extension, extension.upper()):
+            if os.path.isfile(output_dir + written_file_name + written_extension):
+                os.replace(output_dir + written_file_name + written_extension, output_dir + file_name + extension)
+                stage["bytes"] = os.path.getsize(output_dir + file_name + extension)
+                return
+
+
+def is_capture_enabled(context):
+    return context.scene.tsr_capture_in_memory and context.scene.tsr_single_render is False
+
+
+def setup_capture(context):
+    if bpy.app.version[0] >= 5:
+        scene_node_tree = context.scene.compositing_node_group
+    else:
+        scene_node_tree = context.scene.node_tree
+
+    viewer_node = scene_node_tree.nodes.new(type='CompositorNodeViewer')
+    viewer_node.location = (600, 300)
+    viewer_node.name = "The Sims Capture Viewer"
+    viewer_node.label = viewer_node.name
+    if hasattr(viewer_node, "use_alpha"):
+        viewer_node.use_alpha = True
+    scene_node_tree.nodes.active = viewer_node
+
+    # the file outputs inside the muted group are not executed, the add-on writes the outputs itself
+    scene_node_tree.nodes["The Sims Renderer"].mute = True
+
+
+def remove_capture(context):
+    if bpy.app.version[0] >= 5:
+        scene_node_tree = context.scene.compositing_node_group
+    else:
+        scene_node_tree = context.scene.node_tree
+
+    viewer_node = scene_node_tree.nodes.get("The Sims Capture Viewer")
+    if viewer_node is not None:
+        scene_node_tree.nodes.remove(viewer_node)
+    scene_node_tree.nodes["The Sims Renderer"].mute = False
+
+
+def render_capture(context, render_layers_output_index):
+    if bpy.app.version[0] >= 5:
+        scene_node_tree = context.scene.compositing_node_group
+    else:
+        scene_node_tree = context.scene.node_tree
+
+    scene_node_tree.links.new(
+        scene_node_tree.nodes["Render Layers"].outputs[render_layers_output_index],
+        scene_node_tree.nodes["The Sims Capture Viewer"].inputs[0],
+    )
+
+    bpy.ops.render.render(animation=False)
+
+    image = bpy.data.images["Viewer Node"]
+    width, height = image.size
+    pixels = numpy.empty(width * height * 4, dtype=numpy.float32)
+    image.pixels.foreach_get(pixels)
+    return pixels.reshape(height, width, 4)
+
+
+def premultiplied_to_straight(pixels):
+    alpha = pixels[:, :, 3:4]
+    straight = pixels.copy()
+    numpy.divide(pixels[:, :, 0:3], alpha, out=straight[:, :, 0:3], where=alpha > 0)
+    return straight
+
+
+def image_format_properties():
+    properties = ["file_format", "color_mode", "color_depth", "compression", "exr_codec"]
+    if bpy.app.version[0] >= 5:
+        properties.insert(0, "media_type")
+    return properties
+
+
+def save_output_pixels(context, file_path, pixels, output_node, color_managed=True):
+    # written in the format of the output node that would otherwise have written it
+    height, width = pixels.shape[:2]
+    image = bpy.data.images.new("The Sims Image", width, height, alpha=True, float_buffer=True)
+    if output_node.format.file_format == 'OPEN_EXR' or color_managed is False:
+        image.colorspace_settings.name = 'Non-Color'
+    image.pixels.foreach_set(pixels.ravel())
+
+    for name in image_format_properties():
+        setattr(context.scene.render.image_settings, name, getattr(output_node.format, name))
+
+    # applies the scene color management to the color like the color output node
+    with timing.stage("file_write", file_name=os.path.basename(file_path)) as stage:
+        image.save_render(file_path, scene=context.scene)
+        stage["bytes"] = os.path.getsize(file_path)
+    bpy.data.images.remove(image)
+
+
+def apply_output_profile(context):
+    OUTPUT_PROFILES = {
+        'DEFAULT': {"compression": 15, "color_mode": 'RGB', "alpha_color_depth": '32', "exr_codec": 'ZIP'},
+        'COMPACT': {"compression": 15, "color_mode": 'BW', "alpha_color_depth": '16', "exr_codec": 'ZIP'},
+        'FAST': {"compression": 0, "color_mode": 'BW', "alpha_color_depth": '16', "exr_codec": 'NONE'},
+    }
+    output_profile = OUTPUT_PROFILES[context.scene.tsr_output_profile]
+
+    depth_color_depth = '32'
+    if context.scene.tsr_output_profile != 'DEFAULT':
+        depth_color_depth = context.scene.tsr_depth_precision
+
+    output_nodes = renderer_output_nodes(context)
+    output_nodes["color"].format.compression = output_profile["compression"]
+
+    for name in ("alpha", "depth", "extra_depth"):
+        if output_nodes[name] is None:
+            continue
+        output_nodes[name].format.color_mode = output_profile["color_mode"]
+        output_nodes[name].format.color_depth = (
+            output_profile["alpha_color_depth"] if name == "alpha" else depth_color_depth
+        )
+        output_nodes[name].format.exr_codec = output_profile["exr_codec"]
+
+
+def capture_color_and_alpha(context, direction, output_dir):
+    pixels = render_capture(context, 0)
+
+    output_dir = bpy.path.abspath("//") + output_dir
+    # without file output nodes nothing else creates the frame directory
+    os.makedirs(output_dir, exist_ok=True)
+    output_nodes = renderer_output_nodes(context)
+
+    save_output_pixels(
+        context, output_dir + direction + "_color.png", premultiplied_to_straight(pixels), output_nodes["color"]
+    )
+
+    alpha_pixels = numpy.ones_like(pixels)
+    alpha_pixels[:, :, 0:3] = pixels[:, :, 3:4]
+    save_output_pixels(context, output_dir + direction + "_alpha.exr", alpha_pixels, output_nodes["alpha"])
+
+
+def capture_depth(context, file_name, output_dir):
+    if hasattr(bpy.app, "tsr_depth"):
+        pixels = render_capture(context, 2)
+        pixels[:, :, 3] = 1
+    else:
+        pixels = premultiplied_to_straight(render_capture(context, 0))
+
+    os.makedirs(bpy.path.abspath("//") + output_dir, exist_ok=True)
+    save_output_pixels(
+        context,
+        bpy.path.abspath("//") + output_dir + file_name + ".exr",
+        pixels,
+        renderer_output_nodes(context)["depth"],
+    )
+    return pixels
+
+
+def crop_rect(context):
+    # the pixels blender crops the render to, in top left full canvas coordinates
+    canvas_width = context.scene.render.resolution_x * context.scene.render.resolution_percentage // 100
+    canvas_height = context.scene.render.resolution_y * context.scene.render.resolution_percentage // 100
+    min_x = int(context.scene.render.border_min_x * canvas_width)
+    max_x = int(context.scene.render.border_max_x * canvas_width)
+    min_y = int(context.scene.render.border_min_y * canvas_height)
+    max_y = int(context.scene.render.border_max_y * canvas_height)
+    return {
+        "x": min_x,
+        "y": canvas_height - max_y,
+        "width": max_x - min_x,
+        "height": max_y - min_y,
+        "canvas_width": canvas_width,
+        "canvas_height": canvas_height,
+    }
+
+
+def reduce_crop_rect(rect, factor):
+    canvas_width = rect["canvas_width"] // factor
+    canvas_height = rect["canvas_height"] // factor
+    min_x = rect["x"] // factor
+    min_y = rect["y"] // factor
+    max_x = min(canvas_width, -(-(rect["x"] + rect["width"]) // factor))
+    max_y = min(canvas_height, -(-(rect["y"] + rect["height"]) // factor))
+    return {
+        "x": min_x,
+        "y": min_y,
+        "width": max_x - min_x,
+        "height": max_y - min_y,
+        "canvas_width": canvas_width,
+        "canvas_height": canvas_height,
+    }
+
+
+def crop_pixels(pixels, rect):
+    # pixel rows are stored bottom to top
+    bottom = rect["canvas_height"] - rect["y"] - rect["height"]
+    return pixels[bottom : bottom + rect["height"], rect["x"] : rect["x"] + rect["width"]]
+
+
+def uncrop_pixels(pixels, rect):
+    canvas = numpy.zeros((rect["canvas_height"], rect["canvas_width"], pixels.shape[2]), dtype=pixels.dtype)
+    bottom = rect["canvas_height"] - rect["y"] - pixels.shape[0]
+    canvas[bottom : bottom + pixels.shape[0], rect["x"] : rect["x"] + pixels.shape[1]] = pixels
+    return canvas
+
+
+def crop_sidecar_name(direction):
+    return direction + "_crop.json"
+
+
+def save_crop_sidecar(output_dir, direction, crops):
+    file_path = bpy.path.abspath("//") + output_dir + crop_sidecar_name(direction)
+
+    # the passes of a rotation can be rendered separately, each adds its crops
+    if os.path.isfile(file_path):
+        with open(file_path, encoding="utf-8") as file:
+            crops = {**json.load(file), **crops}
+
+    with open(file_path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(crops, file, ensure_ascii=False, indent=2)
+    os.replace(file_path + ".tmp", file_path)
+
+
+def copy_crop_sidecar(frame_directory_abs, source_direction, direction, renamed):
+    # the keys name the images of a rotation, so a copied rotation needs them under its own names
+    source_path = frame_directory_abs + crop_sidecar_name(source_direction)
+    file_path = frame_directory_abs + crop_sidecar_name(direction)
+    if os.path.isfile(source_path) is False:
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+        return
+
+    with open(source_path, encoding="utf-8") as file:
+        crops = json.load(file)
+    crops = {renamed.get(name, name): rect for name, rect in crops.items()}
+
+    with open(file_path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(crops, file, ensure_ascii=False, indent=2)
+    os.replace(file_path + ".tmp", file_path)
+
+
+def uncrop_full_sprites(context, full_sprites_directory):
+    # the compiler reads full canvas images, so cropped renders are padded back before splitting
+    if os.path.isdir(full_sprites_directory) is False:
+        return
+
+    # the padded images are written in the formats of the output profile like the renders
+    apply_output_profile(context)
+    output_nodes = renderer_output_nodes(context)
+    image_settings = {name: getattr(context.scene.render.image_settings, name) for name in image_format_properties()}
+    try:
+        uncrop_frames(context, full_sprites_directory, output_nodes)
+    finally:
+        for name in image_format_properties():
+            setattr(context.scene.render.image_settings, name, image_settings[name])
+
+
+def uncrop_frames(context, full_sprites_directory, output_nodes):
+
+    for frame_name in os.listdir(full_sprites_directory):
+        frame_directory = full_sprites_directory + frame_name + "/"
+        if os.path.isdir(frame_directory) is False:
+            continue
+
+        for file_name in os.listdir(frame_directory):
+            if file_name.endswith("_crop.json") is False:
+                continue
+            with open(frame_directory + file_name, encoding="utf-8") as file:
+                crops = json.load(file)
+
+            # padded images are dropped from the sidecar, so a later split only decodes new crops
+            remaining = dict()
+            for name, rect in crops.items():
+                if os.path.isfile(frame_directory + name) is False:
+                    remaining[name] = rect
+                    continue
+                if name.endswith("_color.png"):
+                    output_node = output_nodes["color"]
+                elif name.endswith("_alpha.exr"):
+                    output_node = output_nodes["alpha"]
+                elif name.endswith("_depth_extra.exr"):
+                    output_node = output_nodes["extra_depth"]
+                else:
+                    output_node = output_nodes["depth"]
+
+                # written next to the image and moved over it, which keeps hard linked copies cropped.
+                # the pixels are read back as they were written, so they are not color managed again
+                padded_path = frame_directory + "uncropped_" + name
+                save_output_pixels(
+                    context,
+                    padded_path,
+                    uncrop_pixels(load_image_pixels(frame_directory + name), rect),
+                    output_node,
+                    color_managed=False,
+                )
+                os.replace(padded_path, frame_directory + name)
+
+            if len(remaining) == len(crops):
+                continue
+            # the sidecar itself stays, the render cache counts it as an output of the rotation
+            with open(frame_directory + file_name + ".tmp", "w", encoding="utf-8") as file:
+                json.dump(remaining, file, ensure_ascii=False, indent=2)
+            os.replace(frame_directory + file_name + ".tmp", frame_directory + file_name)
+
+
+def render_color_and_alpha(context, direction, rotation, output_dir, crops):
+    with timing.stage("color", direction=direction, resolution=context.scene.render.resolution_percentage):
+        if context.scene.tsr_crop_to_border:
+            crops[direction + "_color.png"] = crop_rect(context)
+            crops[direction + "_alpha.exr"] = crop_rect(context)
+
+        if is_capture_enabled(context):
+            capture_color_and_alpha(context, direction, output_dir)
+            return
+
+        output_nodes = renderer_output_nodes(context)
+        set_output_file_name(output_nodes["color"], direction + "_color")
+        set_output_file_name(output_nodes["alpha"], direction + "_alpha")
+
+        bpy.ops.render.render(animation=False)
+
+        output_dir = bpy.path.abspath("//") + output_dir
+
+        move_output(context, output_dir, direction + "_color", ".png")
+        move_output(context, output_dir, direction + "_alpha", ".exr")
+
+
+def render_depth(context, size, direction, rotation, output_dir, extra, crops):
+    with timing.stage(
+        "depth",
+        direction=direction,
+        size=size,
+        extra=extra,
+        resolution=context.scene.render.resolution_percentage,
+    ):
+        file_name = size + "_" + direction + ("_depth" if extra is False else "_depth_extra")
+
+        if context.scene.tsr_crop_to_border:
+            crops[file_name + ".exr"] = crop_rect(context)
+
+        if is_capture_enabled(context):
+            return capture_depth(context, file_name, output_dir)
+
+        output_nodes = renderer_output_nodes(context)
+        set_output_file_name(output_nodes["depth"], file_name)
+
+        bpy.ops.render.render(animation=False)
+
+        output_dir = bpy.path.abspath("//") + output_dir
+
+        move_output(context, output_dir, file_name, ".exr")
+        return None
+
+
+def load_image_pixels(file_path):
+    image = bpy.data.images.load(file_path, check_existing=False)
+    image.colorspace_settings.name = 'Non-Color'
+    width, height = image.size
+    pixels = numpy.empty(width * height * 4, dtype=numpy.float32)
+    image.pixels.foreach_get(pixels)
+    bpy.data.images.remove(image)
+    return pixels.reshape(height, width, 4)
+
+
+def reduce_depth(pixels, factor, clip_end):
+    height = pixels.shape[0] // factor
+    width = pixels.shape[1] // factor
+    depth = pixels[: height * factor, : width * factor, 0]
+
+    # background is 0 when depth comes from the override material and 1e10 from the z pass
+    covered = (depth > 0) & (depth <= clip_end)
+
+    # keep the nearest covered surface of each block so thin edges are not lost
+    nearest = numpy.where(covered, depth, numpy.inf)
+    nearest = nearest.reshape(height, factor, width, factor).min(axis=(1, 3))
+    reduced = numpy.where(numpy.isfinite(nearest), nearest, depth[::factor, ::factor])
+
+    reduced_pixels = numpy.ones((height, width, 4), dtype=numpy.float32)
+    reduced_pixels[:, :, 0:3] = reduced[:, :, numpy.newaxis]
+    return reduced_pixels
+
+
+def write_depth_pyramid(context, direction, output_dir, extra, source_size, crops, pixels=None):
+    with timing.stage("depth_pyramid", direction=direction, extra=extra):
+        output_dir = bpy.path.abspath("//") + output_dir
+
+        file_name = "_depth.exr" if extra is False else "_depth_extra.exr"
+
+        if pixels is None:
+            pixels = load_image_pixels(output_dir + source_size + "_" + direction + file_name)
+        clip_end = context.scene.camera.data.clip_end
+
+        # cropped depth is reduced on the full canvas so the blocks line up with the rendered sizes
+        source_rect = crops.get(source_size + "_" + direction + file_name)
+        if source_rect is not None:
+            pixels = uncrop_pixels(pixels, source_rect)
+
+        if source_size == "full":
+            reductions = (("large", 2), ("medium", 4), ("small", 8))
+        else:
+            reductions = (("medium", 2), ("small", 4))
+
+        for size, factor in reductions:
+            reduced_pixels = reduce_depth(pixels, factor, clip_end)
+            if source_rect is not None:
+                crops[size + "_" + direction + file_name] = reduce_crop_rect(source_rect, factor)
+                reduced_pixels = crop_pixels(reduced_pixels, crops[size + "_" + direction + file_name])
+            save_output_pixels(
+                context,
+                output_dir + size + "_" + direction + file_name,
+                reduced_pixels,
+                renderer_output_nodes(context)["depth"],
+            )
+
+        if source_size == "full":
+            os.remove(output_dir + source_size + "_" + direction + file_name)
+            crops.pop(source_size + "_" + direction + file_name, None)
+
+
+def render_single(context, direction, rotation, output_dir, crops):
+    with timing.stage("single", direction=direction, resolution=200):
+        if context.scene.tsr_crop_to_border:
+            crops[direction + "_color.png"] = crop_rect(context)
+            crops[direction + "_alpha.exr"] = crop_rect(context)
+            crops["full_" + direction + "_depth.exr"] = crop_rect(context)
+            if hasattr(bpy.app, "tsr_depth") is False:
+                crops["full_" + direction + "_depth_extra.exr"] = crop_rect(context)
+
+        output_nodes = renderer_output_nodes(context)
+        set_output_file_name(output_nodes["color"], direction + "_color")
+        set_output_file_name(output_nodes["alpha"], direction + "_alpha")
+        set_output_file_name(output_nodes["depth"], "full_" + direction + "_depth")
+        if output_nodes["extra_depth"] is not None:
+            set_output_file_name(output_nodes["extra_depth"], "full_" + direction + "_depth_extra")
+
+        bpy.ops.render.render(animation=False)
+
+        output_dir = bpy.path.abspath("//") + output_dir
+
+        move_output(context, output_dir, direction + "_color", ".png")
+        move_output(context, output_dir, direction + "_alpha", ".exr")
+        move_output(context, output_dir, "full_" + direction + "_depth", ".exr")
+        if output_nodes["extra_depth"] is not None:
+            move_output(context, output_dir, "full_" + direction + "_depth_extra", ".exr")
+
+
+def copy_layer_collection_settings(source, target):
+    for source_child, target_child in zip(source.children, target.children):
+        target_child.exclude = source_child.exclude
+        target_child.holdout = source_child.holdout
+        target_child.indirect_only = source_child.indirect_only
+        copy_layer_collection_settings(source_child, target_child)
+
+
+def setup_single_render(context, depth_override_material):
+    if bpy.app.version[0] >= 5:
+        scene_node_tree = context.scene.compositing_node_group
+    else:
+        scene_node_tree = context.scene.node_tree
+
+    group_node = scene_node_tree.nodes.get("The Sims Renderer")
+
+    layer_names = ["The Sims Depth"]
+    if hasattr(bpy.app, "tsr_depth") is False:
+        layer_names.append("The Sims Depth Extra")
+
+    # only the samples and denoising can be set per view layer, the pixel filter width, bounces and adaptive
+    # sampling are scene settings shared with the color layer, so the depth is filtered like the color.
+    # the extra depth keeps the scene samples like the extra depth render of the normal path
+    for index, layer_name in enumerate(layer_names):
+        view_layer = context.scene.view_layers.new(layer_name)
+        copy_layer_collection_settings(context.view_layer.layer_collection, view_layer.layer_collection)
+        view_layer.use_pass_z = True
+        view_layer.material_override = depth_override_material
+        view_layer.cycles.use_denoising = False
+        if layer_name == "The Sims Depth" and hasattr(bpy.app, "tsr_depth") is False:
+            view_layer.samples = 1
+
+        render_layers_node = scene_node_tree.nodes.new('CompositorNodeRLayers')
+        render_layers_node.location = (0, -300 * (index + 1))
+        render_layers_node.name = layer_name + " Render Layers"
+        render_layers_node.label = render_layers_node.name
+        render_layers_node.layer = layer_name
+
+        depth_group_node = scene_node_tree.nodes.new('CompositorNodeGroup')
+        depth_group_node.node_tree = bpy.data.node_groups["The Sims Renderer Pre Depth"]
+        depth_group_node.location = (200, -300 * (index + 1))
+        depth_group_node.name = layer_name + " Pre Depth"
+        depth_group_node.label = depth_group_node.name
+        depth_group_node.width = 200
+        scene_node_tree.links.new(render_layers_node.outputs[0], depth_group_node.inputs[0])
+        scene_node_tree.links.new(render_layers_node.outputs[2], depth_group_node.inputs[1])
+
+        if layer_name == "The Sims Depth":
+            scene_node_tree.links.new(depth_group_node.outputs[0], group_node.inputs[2])
+            continue
+
+        extra_depth_output_node = scene_node_tree.nodes.new(type='CompositorNodeOutputFile')
+        extra_depth_output_node.location = (600, -300 * (index + 1))
+        extra_depth_output_node.name = "The Sims Depth Extra Output"
+        extra_depth_output_node.label = extra_depth_output_node.name
+        if bpy.app.version[0] >= 5:
+            extra_depth_output_node.format.media_type = 'IMAGE'
+        extra_depth_output_node.format.file_format = 'OPEN_EXR'
+        extra_depth_output_node.format.color_mode = 'RGB'
+
+        # Only apply color management overrides on legacy Blender versions
+        if bpy.app.version[0] == 4:
+            extra_depth_output_node.format.color_management = 'OVERRIDE'
+            extra_depth_output_node.format.view_settings.view_transform = 'Raw'
+            extra_depth_output_node.format.linear_colorspace_settings.name = 'Non-Color'
+
+        if bpy.app.version[0] >= 5:
+            extra_depth_output_node.file_name = "extra_depth"
+            extra_depth_output_node.file_output_items.new('RGBA', "")
+        else:
+            extra_depth_output_node.file_slots[0].path = "extra_depth"
+        scene_node_tree.links.new(depth_group_node.outputs[0], extra_depth_output_node.inputs[0])
+
+
+def remove_single_render(context):
+    if bpy.app.version[0] >= 5:
+        scene_node_tree = context.scene.compositing_node_group
+    else:
+        scene_node_tree = context.scene.node_tree
+
+    for layer_name in ("The Sims Depth", "The Sims Depth Extra"):
+        view_layer = context.scene.view_layers.get(layer_name)
+        if view_layer is not None:
+            context.scene.view_layers.remove(view_layer)
+
+    node_names = (
+        "The Sims Depth Render Layers",
+        "The Sims Depth Pre Depth",
+        "The Sims Depth Extra Render Layers",
+        "The Sims Depth Extra Pre Depth",
+        "The Sims Depth Extra Output",
+    )
+    for node_name in node_names:
+        node = scene_node_tree.nodes.get(node_name)
+        if node is not None:
+            scene_node_tree.nodes.remove(node)
+
+    scene_node_tree.links.new(
+        scene_node_tree.nodes["The Sims Renderer Pre Depth"].outputs[0],
+        scene_node_tree.nodes["The Sims Renderer"].inputs[2],
+    )
+
+
+def rotated_camera_matrix(context, rotation):
+    rotation_origin = bpy.data.objects["The Sims Rotation Origin"]
+    rotation_origin_matrix = mathutils.Matrix.LocRotScale(
+        rotation_origin.location,
+        mathutils.Euler((0, 0, math.radians(rotation))),
+        rotation_origin.scale,
+    )
+    camera = context.scene.camera
+    return rotation_origin_matrix @ camera.matrix_parent_inverse @ camera.matrix_basis
+
+
+def world_to_camera_view(context, camera_matrix, points):
+    # vectorised version of bpy_extras.object_utils.world_to_camera_view for an array of points
+    camera = context.scene.camera
+    camera_inverse = numpy.array(camera_matrix.normalized().inverted(), dtype=numpy.float64)
+    local = points @ camera_inverse[:3, :3].T + camera_inverse[:3, 3]
+
+    frame = camera.data.view_frame(scene=context.scene)
+    min_x, max_x = frame[2].x, frame[1].x
+    min_y, max_y = frame[1].y, frame[0].y
+
+    if camera.data.type == 'ORTHO':
+        view_x = (local[..., 0] - min_x) / (max_x - min_x)
+        view_y = (local[..., 1] - min_y) / (max_y - min_y)
+    else:
+        z = -local[..., 2]
+        scale = z / -frame[0].z
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            view_x = numpy.where(z == 0, 0.5, (local[..., 0] - min_x * scale) / ((max_x - min_x) * scale))
+            view_y = numpy.where(z == 0, 0.5, (local[..., 1] - min_y * scale) / ((max_y - min_y) * scale))
+
+    return view_x, view_y
+
+
+def compute_render_borders(context, rotations, cache, excluded_names=frozenset()):
+    renderable_object_types = ['FONT', 'MESH', 'META', 'SURFACE']
+
+    objects = context.view_layer.objects
+    object_count = len(objects)
+
+    renderable = numpy.fromiter(
+        (
+            obj.hide_render is False
+            and obj.visible_camera
+            and obj.type in renderable_object_types
+            and obj.name_full not in excluded_names
+            for obj in objects
+        ),
+        dtype=bool,
+        count=object_count,
+    )
+    names = [obj.name_full for obj, is_renderable in zip(objects, renderable) if is_renderable]
+
+    matrices = numpy.empty(object_count * 16, dtype=numpy.float32)
+    objects.foreach_get("matrix_world", matrices)
+    # matrices are stored column major, so each one is the transpose of matrix_world
+    matrices = matrices.reshape(object_count, 4, 4)[renderable]
+
+    bounds = numpy.empty(object_count * 24, dtype=numpy.float32)
+    objects.foreach_get("bound_box", bounds)
+    bounds = bounds.reshape(object_count, 8, 3)[renderable]
+
+    camera_matrices = [rotated_camera_matrix(context, rotation) for rotation in rotations]
+    camera_key = (
+        tuple(rotations),
+        tuple(tuple(value for row in matrix for value in row) for matrix in camera_matrices),
+        tuple(tuple(vertex) for vertex in context.scene.camera.data.view_frame(scene=context.scene)),
+    )
+
+    # only project objects whose transform or bounds changed since the last frame
+    if cache.get("names") == names and cache.get("camera") == camera_key:
+        changed = numpy.any(cache["matrices"] != matrices, axis=(1, 2))
+        changed |= numpy.any(cache["bounds"] != bounds, axis=(1, 2))
+        rects = cache["rects"]
+    else:
+        changed = numpy.ones(len(names), dtype=bool)
+        rects = numpy.empty((len(rotations), len(names), 4), dtype=numpy.float64)
+
+    if numpy.any(changed):
+        corners = numpy.concatenate((bounds[changed], numpy.ones((int(numpy.sum(changed)), 8, 1))), axis=2)
+        world_corners = (corners @ matrices[changed])[:, :, :3]
+
+        for rotation_index, camera_matrix in enumerate(camera_matrices):
+            view_x, view_y = world_to_camera_view(context, camera_matrix, world_corners)
+            rects[rotation_index, changed, 0] = view_x.min(axis=1)
+            rects[rotation_index, changed, 1] = view_x.max(axis=1)
+            rects[rotation_index, changed, 2] = view_y.min(axis=1)
+            rects[rotation_index, changed, 3] = view_y.max(axis=1)
+
+    cache["names"] = names
+    cache["camera"] = camera_key
+    cache["matrices"] = matrices
+    cache["bounds"] = bounds
+    cache["rects"] = rects
+
+    borders = dict()
+    for rotation_index, rotation in enumerate(rotations):
+        if len(names) == 0:
+            borders[rotation] = (1, 0, 1, 0)
+            continue
+        borders[rotation] = (
+            max(0, min(1, rects[rotation_index, :, 0].min())),
+            min(1, max(0, rects[rotation_index, :, 1].max())),
+            max(0, min(1, rects[rotation_index, :, 2].min())),
+            min(1, max(0, rects[rotation_index, :, 3].max())),
+        )
+
+    return borders
+
+
+def object_hull(obj, hull_cache):
+    # meshes without modifiers or shape keys keep the session uid of their original mesh between frames
+    key = None
+    if obj.type == 'MESH' and len(obj.original.modifiers) == 0 and obj.original.data.shape_keys is None:
+        key = obj.data.session_uid
+        if key in hull_cache:
+            return hull_cache[key]
+
+    if obj.type == 'MESH':
+        mesh = obj.data
+    else:
+        mesh = obj.to_mesh()
+
+    vertices = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float64)
+    mesh.vertices.foreach_get("co", vertices)
+    vertices = vertices.reshape(-1, 3)
+
+    # the extremes of a projected mesh are always on its convex hull
+    MIN_HULL_VERTICES = 64
+    if key is not None and len(vertices) > MIN_HULL_VERTICES:
+        bm = bmesh.new()
+        bm.from_mesh(mesh)
+        result = bmesh.ops.convex_hull(bm, input=bm.verts)
+        hull_vertices = [tuple(ele.co) for ele in result["geom"] if isinstance(ele, bmesh.types.BMVert)]
+        bm.free()
+        if len(hull_vertices) >= 4:
+            vertices = numpy.array(hull_vertices, dtype=numpy.float64)
+
+    if obj.type != 'MESH':
+        obj.to_mesh_clear()
+
+    if key is not None:
+        hull_cache[key] = vertices
+
+    return vertices
+
+
+def match_viewport_modifiers_to_render(context):
+    # the borders are projected from the viewport evaluation, so its modifiers are set up like the render
+    changes = list()
+    for obj in context.scene.objects:
+        for modifier in obj.modifiers:
+            if modifier.show_viewport != modifier.show_render:
+                changes.append((modifier, "show_viewport", modifier.show_viewport))
+                modifier.show_viewport = modifier.show_render
+            if modifier.type in {'SUBSURF', 'MULTIRES'} and modifier.levels != modifier.render_levels:
+                changes.append((modifier, "levels", modifier.levels))
+                modifier.levels = modifier.render_levels
+    return changes
+
+
+def restore_viewport_modifiers(changes):
+    for modifier, name, value in reversed(changes):
+        setattr(modifier, name, value)
+
+
+def compute_precise_render_borders(context, rotations, cache):
+    renderable_object_types = ['FONT', 'MESH', 'META', 'SURFACE']
+
+    hull_cache = cache.setdefault("hulls", dict())
+
+    depsgraph = context.evaluated_depsgraph_get()
+
+    world_vertices = list()
+    evaluated_names = set()
+
+    for instance in depsgraph.object_instances:
+        obj = instance.object
+        if obj.type not in renderable_object_types:
+            continue
+
+        if instance.is_instance:
+            instancer = instance.parent.original
+            if instancer.hide_render or not instancer.visible_camera:
+                continue
+        else:
+            if obj.original.hide_render or not obj.original.visible_camera:
+                continue
+            evaluated_names.add(obj.original.name_full)
+
+        vertices = object_hull(obj, hull_cache)
+        if len(vertices) == 0:
+            continue
+
+        matrix = numpy.array(instance.matrix_world, dtype=numpy.float64)
+        world_vertices.append(vertices @ matrix[:3, :3].T + matrix[:3, 3])
+
+    # objects hidden in the viewport are not in the depsgraph so fall back to their bounding boxes
+    borders = compute_render_borders(context, rotations, cache.setdefault("bound_box", dict()), evaluated_names)
+
+    if len(world_vertices) == 0:
+        return borders
+
+    world_vertices = numpy.concatenate(world_vertices)
+
+    for rotation in rotations:
+        view_x, view_y = world_to_camera_view(context, rotated_camera_matrix(context, rotation), world_vertices)
+        border_min_x, border_max_x, border_min_y, border_max_y = borders[rotation]
+        borders[rotation] = (
+            max(0, min(border_min_x, view_x.min())),
+            min(1, max(border_max_x, view_x.max())),
+            max(0, min(border_min_y, view_y.min())),
+            min(1, max(border_max_y, view_y.max())),
+        )
+
+    return borders
+
+
+def upscale_pixels(pixels, factor):
+    return numpy.repeat(numpy.repeat(pixels, factor, axis=0), factor, axis=1)
+
+
+def scale_crop_rect(rect, factor):
+    return {name: value * factor for name, value in rect.items()}
+
+
+def upscale_color_and_alpha(context, direction, output_dir, crops):
+    # the compiler reads the color and alpha at 200%
+    output_dir = bpy.path.abspath("//") + output_dir
+
+    output_nodes = renderer_output_nodes(context)
+
+    # the color was color managed when it was rendered
+    color_pixels = load_image_pixels(output_dir + direction + "_color.png")
+    save_output_pixels(
+        context,
+        output_dir + direction + "_color.png",
+        upscale_pixels(color_pixels, 2),
+        output_nodes["color"],
+        color_managed=False,
+    )
+
+    alpha_pixels = load_image_pixels(output_dir + direction + "_alpha.exr")
+    save_output_pixels(
+        context, output_dir + direction + "_alpha.exr", upscale_pixels(alpha_pixels, 2), output_nodes["alpha"]
+    )
+
+    for name in (direction + "_color.png", direction + "_alpha.exr"):
+        if name in crops:
+            crops[name] = scale_crop_rect(crops[name], 2)
+
+
+def image_difference(reference_pixels, pixels):
+    difference = numpy.abs(reference_pixels - pixels)
+    mean_squared_error = float(numpy.mean(numpy.square(difference)))
+    psnr = math.inf if mean_squared_error == 0 else 10 * math.log10(1 / mean_squared_error)
+    return float(numpy.mean(difference)), float(numpy.max(difference)), psnr
+
+
+def compare_color(report, context):
+    if not can_render(report, context):
+        return
+
+    rotations = enabled_rotations(context)
+    if len(rotations) == 0:
+        report({'ERROR'}, "[Compare] Please enable a rotation")
+        return
+
+    direction, rotation = rotations[0]
+    object_name = bpy.path.display_name_from_filepath(context.blend_data.filepath)
+    comparison_directory = object_name + " - color comparison/"
+
+    original_color_strategy = context.scene.tsr_color_strategy
+    original_crop_to_border = context.scene.tsr_crop_to_border
+    context.scene.tsr_crop_to_border = False
+    original_single_render = context.scene.tsr_single_render
+    context.scene.tsr_single_render = False
+
+    state = begin_render(context)
+    try:
+        border = compute_borders(context, [rotation], dict())[rotation]
+        for color_strategy in ('FULL', 'HALF'):
+            context.scene.tsr_color_strategy = color_strategy
+            render_rotation(context, direction, rotation, comparison_directory + color_strategy.lower() + "/", border)
+    finally:
+        context.scene.tsr_color_strategy = original_color_strategy
+        end_render(context, state)
+        context.scene.tsr_crop_to_border = original_crop_to_border
+        context.scene.tsr_single_render = original_single_render
+
+    comparison_directory_abs = bpy.path.abspath("//") + comparison_directory
+    if os.path.isfile(comparison_directory_abs + "full/" + direction + "_color.png") is False:
+        report({'ERROR'}, "[Compare] Nothing was rendered, the object is outside the view")
+        return
+
+    # compared at the size of the large sprite, the 200% reference is box filtered like the compiler does
+    messages = list()
+    for name in ("_color.png", "_alpha.exr"):
+        reference_pixels = load_image_pixels(comparison_directory_abs + "full/" + direction + name)
+        height = reference_pixels.shape[0] // 2
+        width = reference_pixels.shape[1] // 2
+        reference_pixels = reference_pixels[: height * 2, : width * 2].reshape(height, 2, width, 2, 4).mean(axis=(1, 3))
+        pixels = load_image_pixels(comparison_directory_abs + "half/" + direction + name)[::2, ::2][:height, :width]
+
+        mean_difference, max_difference, psnr = image_difference(reference_pixels[:, :, 0:3], pixels[:, :, 0:3])
+        messages.append(
+            "{} mean difference {:.4f}, max difference {:.4f}, PSNR {:.1f} dB".format(
+                name[1:].split(".")[0], mean_difference, max_difference, psnr
+            )
+        )
+
+    shutil.rmtree(comparison_directory_abs)
+
+    report({'INFO'}, "[Compare] " + direction + " 100% against 200%: " + "; ".join(messages))
+
+
+class TS1R_OT_compare_color(bpy.types.Operator):
+    """Render the current frame with the 100% color and the 200% color and report the difference at the large sprite size"""
+
+    bl_idname = "tsr.compare_color"
+    bl_label = "Compare Color"
+    bl_options = {'REGISTER'}
+
+    @classmethod
+    def poll(cls, context):
+        return modal_render["running"] is False
+
+    def execute(self, context):
+        compare_color(self.report, context)
+
+        return {'FINISHED'}
+
+
+def time_budget_samples(context):
+    PROBE_SAMPLES = (8, 2)
+
+    if bpy.app.version[0] >= 5:
+        scene_node_tree = context.scene.compositing_node_group
+    else:
+        scene_node_tree = context.scene.node_tree
+
+    # the probe must not write any outputs
+    group_node = scene_node_tree.nodes["The Sims Renderer"]
+    original_group_node_mute = group_node.mute
+    group_node.mute = True
+
+    original_cycles_samples = context.scene.cycles.samples
+    original_cycles_use_adaptive_sampling = context.scene.cycles.use_adaptive_sampling
+    context.scene.cycles.use_adaptive_sampling = False
+
+    # both probes sync the scene, so their difference is the cost of the extra samples alone.
+    # the larger probe goes first, so a sync persistent data only does once errs on fewer samples
+    probe_seconds = list()
+    for probe_samples in PROBE_SAMPLES:
+        context.scene.cycles.samples = probe_samples
+        start_time = time.perf_counter()
+        bpy.ops.render.render(animation=False)
+        probe_seconds.append(time.perf_counter() - start_time)
+
+    seconds_per_sample = (probe_seconds[0] - probe_seconds[1]) / (PROBE_SAMPLES[0] - PROBE_SAMPLES[1])
+    if seconds_per_sample <= 0:
+        seconds_per_sample = probe_seconds[0] / PROBE_SAMPLES[0]
+    sync_seconds = max(0, probe_seconds[1] - PROBE_SAMPLES[1] * seconds_per_sample)
+
+    # the probes and the sync of the render itself are spent from the budget
+    sample_seconds = context.scene.tsr_time_budget - sum(probe_seconds) - sync_seconds
+
+    context.scene.cycles.samples = original_cycles_samples
+    context.scene.cycles.use_adaptive_sampling = original_cycles_use_adaptive_sampling
+    group_node.mute = original_group_node_mute
+
+    return max(1, min(original_cycles_samples, int(sample_seconds / seconds_per_sample)))
+
+
+def padded_border(context, border):
+    border_min_x, border_max_x, border_min_y, border_max_y = border
+
+    if context.scene.tsr_precise_border:
+        # padding is in pixels of the large sprite
+        border_padding_x = context.scene.tsr_border_padding / context.scene.render.resolution_x
+        border_padding_y = context.scene.tsr_border_padding / context.scene.render.resolution_y
+    else:
+        BORDER_PADDING = 0.01
+        border_padding_x = BORDER_PADDING
+        border_padding_y = BORDER_PADDING
+
+    return (
+        max(0, border_min_x - border_padding_x),
+        min(1, border_max_x + border_padding_x),
+        max(0, border_min_y - border_padding_y),
+        min(1, border_max_y + border_padding_y),
+    )
+
+
+def is_border_empty(border):
+    border_min_x, border_max_x, border_min_y, border_max_y = border
+    return border_min_x >= border_max_x or border_min_y >= border_max_y
+
+
+def render_rotation(context, direction, rotation, output_dir, border, passes=('DEPTH', 'COLOR')):
+    bpy.data.objects["The Sims Rotation Origin"].rotation_euler = (
+        0,
+        0,
+        math.radians(rotation),
+    )
+    context.view_layer.update()
+
+    if is_border_empty(border):
+        return
+
+    (
+        context.scene.render.border_min_x,
+        context.scene.render.border_max_x,
+        context.scene.render.border_min_y,
+        context.scene.render.border_max_y,
+    ) = padded_border(context, border)
+
+    if bpy.app.version[0] >= 5:
+        scene_node_tree = context.scene.compositing_node_group
+    else:
+        scene_node_tree = context.scene.node_tree
+
+    render_group_node_tree = scene_node_tree.nodes.get("The Sims Renderer").node_tree
+    input_node = render_group_node_tree.nodes.get("The Sims Input")
+    alpha_convert_node = render_group_node_tree.nodes.get("The Sims Alpha Convert")
+    color_output_node = render_group_node_tree.nodes.get("The Sims Color Output")
+    alpha_output_node = render_group_node_tree.nodes.get("The Sims Alpha Output")
+    depth_output_node = render_group_node_tree.nodes.get("The Sims Depth Output")
+
+    depth_group_node_tree = scene_node_tree.nodes.get("The Sims Renderer Pre Depth").node_tree
+    depth_switch_node = depth_group_node_tree.nodes.get("The Sims Depth Switch")
+
+    if bpy.app.version[0] >= 5:
+        depth_switch_node.inputs[0].default_value = hasattr(bpy.app, "tsr_depth")
+    else:
+        depth_switch_node.check = hasattr(bpy.app, "tsr_depth")
+
+    output_dir_relative = "//" + output_dir
+
+    extra_depth_output_node = scene_node_tree.nodes.get("The Sims Depth Extra Output")
+
+    crops = dict()
+
+    if bpy.app.version[0] >= 5:
+        color_output_node.directory = output_dir_relative
+        alpha_output_node.directory = output_dir_relative
+        depth_output_node.directory = output_dir_relative
+        if extra_depth_output_node is not None:
+            extra_depth_output_node.directory = output_dir_relative
+    else:
+        color_output_node.base_path = output_dir_relative
+        alpha_output_node.base_path = output_dir_relative
+        depth_output_node.base_path = output_dir_relative
+        if extra_depth_output_node is not None:
+            extra_depth_output_node.base_path = output_dir_relative
+
+    if context.scene.tsr_single_render:
+        render_group_node_tree.links.new(input_node.outputs[0], alpha_convert_node.inputs[0])
+        render_group_node_tree.links.new(input_node.outputs[1], alpha_output_node.inputs[0])
+        render_group_node_tree.links.new(input_node.outputs[2], depth_output_node.inputs[0])
+
+        original_resolution_percentage = context.scene.render.resolution_percentage
+        context.scene.render.resolution_percentage = 200
+        render_single(context, direction, rotation, output_dir, crops)
+        context.scene.render.resolution_percentage = original_resolution_percentage
+
+        render_group_node_tree.links.remove(input_node.outputs[0].links[0])
+        render_group_node_tree.links.remove(input_node.outputs[1].links[0])
+        render_group_node_tree.links.remove(input_node.outputs[2].links[0])
+
+        write_depth_pyramid(context, direction, output_dir, False, "full", crops)
+        if hasattr(bpy.app, "tsr_depth") is False:
+            write_depth_pyramid(context, direction, output_dir, True, "full", crops)
+
+        if context.scene.tsr_crop_to_border:
+            save_crop_sidecar(output_dir, direction, crops)
+        return
+
+    original_cycles_max_bounces = context.scene.cycles.max_bounces
+    original_cycles_filter_width = context.scene.cycles.filter_width
+    original_cycles_use_denoising = context.scene.cycles.use_denoising
+    original_cycles_use_adaptive_sampling = context.scene.cycles.use_adaptive_sampling
+    original_cycles_samples = context.scene.cycles.samples
+    original_resolution_percentage = context.scene.render.resolution_percentage
+
+    if 'DEPTH' in passes:
+        render_group_node_tree.links.new(input_node.outputs[2], depth_output_node.inputs[0])
+
+        context.scene.cycles.max_bounces = 0
+        context.scene.cycles.filter_width = 1
+        context.scene.cycles.use_denoising = False
+        context.scene.cycles.use_adaptive_sampling = False
+
+        context.view_layer.material_override = bpy.data.materials["The Sims Depth Override"]
+
+        if hasattr(bpy.app, "tsr_depth") is False:
+            context.scene.cycles.samples = 1
+
+        if context.scene.tsr_depth_pyramid:
+            context.scene.render.resolution_percentage = 100
+            pixels = render_depth(context, "large", direction, rotation, output_dir, False, crops)
+            write_depth_pyramid(context, direction, output_dir, False, "large", crops, pixels)
+        else:
+            context.scene.render.resolution_percentage = 25
+            render_depth(context, "small", direction, rotation, output_dir, False, crops)
+            context.scene.render.resolution_percentage = 50
+            render_depth(context, "medium", direction, rotation, output_dir, False, crops)
+            context.scene.render.resolution_percentage = 100
+            render_depth(context, "large", direction, rotation, output_dir, False, crops)
+
+        context.scene.cycles.samples = original_cycles_samples
+
+        if hasattr(bpy.app, "tsr_depth") is False:
+            if context.scene.tsr_depth_pyramid:
+                context.scene.render.resolution_percentage = 100
+                pixels = render_depth(context, "large", direction, rotation, output_dir, True, crops)
+                write_depth_pyramid(context, direction, output_dir, True, "large", crops, pixels)
+            else:
+                context.scene.render.resolution_percentage = 25
+                render_depth(context, "small", direction, rotation, output_dir, True, crops)
+                context.scene.render.resolution_percentage = 50
+                render_depth(context, "medium", direction, rotation, output_dir, True, crops)
+                context.scene.render.resolution_percentage = 100
+                render_depth(context, "large", direction, rotation, output_dir, True, crops)
+
+        render_group_node_tree.links.remove(input_node.outputs[2].links[0])
+
+        context.view_layer.material_override = None
+
+        context.scene.cycles.use_adaptive_sampling = original_cycles_use_adaptive_sampling
+        context.scene.cycles.use_denoising = original_cycles_use_denoising
+        context.scene.cycles.filter_width = original_cycles_filter_width
+        context.scene.cycles.max_bounces = original_cycles_max_bounces
+
+    if 'COLOR' in passes:
+        render_group_node_tree.links.new(input_node.outputs[0], alpha_convert_node.inputs[0])
+        render_group_node_tree.links.new(input_node.outputs[1], alpha_output_node.inputs[0])
+
+        context.scene.render.resolution_percentage = 200
+
+        if context.scene.tsr_color_strategy == 'HALF':
+            context.scene.render.resolution_percentage = 100
+            context.scene.cycles.filter_width = context.scene.tsr_color_filter_width
+            context.scene.cycles.samples = max(1, round(original_cycles_samples * context.scene.tsr_color_sample_scale))
+
+        original_cycles_adaptive_threshold = context.scene.cycles.adaptive_threshold
+        if context.scene.tsr_sampling_mode != 'SCENE':
+            context.scene.cycles.use_adaptive_sampling = True
+            context.scene.cycles.adaptive_threshold = context.scene.tsr_noise_target
+        if context.scene.tsr_sampling_mode == 'TIME_BUDGET':
+            context.scene.cycles.samples = time_budget_samples(context)
+
+        render_color_and_alpha(context, direction, rotation, output_dir, crops)
+
+        if context.scene.tsr_color_strategy == 'HALF':
+            upscale_color_and_alpha(context, direction, output_dir, crops)
+
+        context.scene.cycles.samples = original_cycles_samples
+        context.scene.cycles.use_adaptive_sampling = original_cycles_use_adaptive_sampling
+        context.scene.cycles.adaptive_threshold = original_cycles_adaptive_threshold
+        context.scene.cycles.filter_width = original_cycles_filter_width
+
+        render_group_node_tree.links.remove(input_node.outputs[0].links[0])
+        render_group_node_tree.links.remove(input_node.outputs[1].links[0])
+
+    context.scene.render.resolution_percentage = original_resolution_percentage
+
+    if context.scene.tsr_crop_to_border:
+        save_crop_sidecar(output_dir, direction, crops)
+
+
+def rotation_passes(context):
+    # with persistent data the depth passes of every rotation run before the color passes,
+    # so the depth override material is only swapped twice per frame
+    if context.scene.tsr_persistent_data and context.scene.tsr_single_render is False:
+        return [('DEPTH',), ('COLOR',)]
+    return [('DEPTH', 'COLOR')]
+
+
+def plain_value(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, "__len__"):
+        return tuple(plain_value(item) for item in value)
+    return repr(value)
+
+
+def hash_struct(hasher, struct, excluded_properties=frozenset()):
+    for prop in struct.bl_rna.properties:
+        if prop.identifier == "rna_type" or prop.type in {'POINTER', 'COLLECTION'}:
+            continue
+        if prop.identifier in excluded_properties:
+            continue
+        hasher.update(repr((prop.identifier, plain_value(getattr(struct, prop.identifier, None)))).encode())
+
+
+def hash_node_tree(hasher, node_tree, visited):
+    if node_tree is None or node_tree.name_full in visited:
+        return
+    visited.add(node_tree.name_full)
+
+    for node in sorted(node_tree.nodes, key=lambda node: node.name):
+        hasher.update(node.bl_idname.encode())
+        hash_struct(hasher, node)
+
+        for socket in node.inputs:
+            if hasattr(socket, "default_value"):
+                hasher.update(repr((socket.identifier, plain_value(socket.default_value))).encode())
+
+        image = getattr(node, "image", None)
+        if image is not None:
+            image_path = bpy.path.abspath(image.filepath, library=image.library)
+            image_modified = os.path.getmtime(image_path) if os.path.isfile(image_path) else None
+            hasher.update(repr((image.name_full, image_path, image_modified, image.packed_file is not None)).encode())
+            hash_struct(hasher, image.colorspace_settings)
+
+        hash_node_tree(hasher, getattr(node, "node_tree", None), visited)
+
+    for link in node_tree.links:
+        hasher.update(
+            repr(
+                (
+                    link.from_node.name,
+                    link.from_socket.identifier,
+                    link.to_node.name,
+                    link.to_socket.identifier,
+                    link.is_muted,
+                )
+            ).encode()
+        )
+
+
+def hash_mesh(hasher, mesh):
+    attribute_fields = {
+        'FLOAT': ("value", 1, numpy.float32),
+        'INT': ("value", 1, numpy.int32),
+        'BOOLEAN': ("value", 1, bool),
+        'FLOAT_VECTOR': ("vector", 3, numpy.float32),
+        'FLOAT2': ("vector", 2, numpy.float32),
+        'FLOAT_COLOR': ("color", 4, numpy.float32),
+        'BYTE_COLOR': ("color", 4, numpy.float32),
+        'QUATERNION': ("value", 4, numpy.float32),
+    }
+
+    vertices = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float32)
+    mesh.vertices.foreach_get("co", vertices)
+    hasher.update(vertices.tobytes())
+
+    loop_vertices = numpy.empty(len(mesh.loops), dtype=numpy.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+    hasher.update(loop_vertices.tobytes())
+
+    polygon_loop_starts = numpy.empty(len(mesh.polygons), dtype=numpy.int32)
+    mesh.polygons.foreach_get("loop_start", polygon_loop_starts)
+    hasher.update(polygon_loop_starts.tobytes())
+
+    for attribute in sorted(mesh.attributes, key=lambda attribute: attribute.name):
+        if attribute.data_type not in attribute_fields:
+            continue
+        field, size, dtype = attribute_fields[attribute.data_type]
+        values = numpy.empty(len(attribute.data) * size, dtype=dtype)
+        attribute.data.foreach_get(field, values)
+        hasher.update(repr((attribute.name, attribute.domain, attribute.data_type)).encode())
+        hasher.update(values.tobytes())
+
+
+def frame_fingerprint(context, mesh_hashes):
+    # objects parented to the rotation origin are hashed at the first rotation,
+    # wherever the rotations rendered before the frame left the origin
+    rotation_origin = bpy.data.objects["The Sims Rotation Origin"]
+    original_rotation = copy.copy(rotation_origin.rotation_euler)
+    rotation_origin.rotation_euler = (0, 0, 0)
+    context.view_layer.update()
+    try:
+        return hash_frame(context, mesh_hashes)
+    finally:
+        rotation_origin.rotation_euler = original_rotation
+
+
+def hash_frame(context, mesh_hashes):
+    hasher = hashlib.sha256()
+    scene = context.scene
+
+    hasher.update(repr((bl_info["version"], bpy.app.version, hasattr(bpy.app, "tsr_depth"))).encode())
+    hasher.update(repr((scene.tsr_x, scene.tsr_y)).encode())
+    if scene.cycles.use_animated_seed:
+        hasher.update(repr(scene.frame_current).encode())
+    hasher.update(
+        repr(
+            (
+                scene.tsr_depth_pyramid,
+                scene.tsr_single_render,
+                scene.tsr_capture_in_memory,
+                scene.tsr_crop_to_border,
+                scene.tsr_output_profile,
+                scene.tsr_depth_precision,
+                scene.tsr_sampling_mode,
+                scene.tsr_noise_target,
+                scene.tsr_time_budget,
+                scene.tsr_color_strategy,
+                scene.tsr_color_filter_width,
+                scene.tsr_color_sample_scale,
+                scene.tsr_precise_border,
+                scene.tsr_border_padding,
+                scene.tsr_symmetry,
+            )
+        ).encode()
+    )
+    if hasattr(scene, "gltf2_active_variant"):
+        hasher.update(repr(scene.gltf2_active_variant).encode())
+
+    hash_struct(hasher, scene.cycles)
+    hash_struct(hasher, scene.view_settings)
+    hash_struct(hasher, scene.display_settings)
+    # the settings begin_render sets follow from the add-on settings above,
+    # so a plan made outside a render gets the same fingerprint as the render
+    hash_struct(
+        hasher,
+        scene.render,
+        {
+            "border_min_x",
+            "border_max_x",
+            "border_min_y",
+            "border_max_y",
+            "resolution_percentage",
+            "filepath",
+            "film_transparent",
+            "use_border",
+            "use_crop_to_border",
+            "use_persistent_data",
+            "resolution_x",
+            "resolution_y",
+        },
+    )
+
+    visited_node_trees = set()
+
+    if scene.world is not None:
+        hash_struct(hasher, scene.world)
+        hash_node_tree(hasher, scene.world.node_tree, visited_node_trees)
+
+    materials = dict()
+
+    depsgraph = context.evaluated_depsgraph_get()
+    for instance in depsgraph.object_instances:
+        obj = instance.object
+        if obj.type not in {'FONT', 'MESH', 'META', 'SURFACE', 'CURVE', 'LIGHT', 'CAMERA'}:
+            continue
+
+        instancer = instance.parent.original if instance.is_instance else obj.original
+        hasher.update(
+            repr(
+                (
+                    obj.original.name_full,
+                    obj.type,
+                    instancer.hide_render,
+                    instancer.visible_camera,
+                    plain_value(instance.matrix_world),
+                )
+            ).encode()
+        )
+
+        if obj.type == 'LIGHT':
+            hash_struct(hasher, obj.data)
+            hash_node_tree(hasher, obj.data.node_tree, visited_node_trees)
+            continue
+
+        if obj.type == 'CAMERA':
+            hash_struct(hasher, obj.data)
+            continue
+
+        for slot in obj.material_slots:
+            if slot.material is not None:
+                materials[slot.material.original.name_full] = slot.material
+            hasher.update(repr(slot.material.original.name_full if slot.material is not None else None).encode())
+
+        # meshes without modifiers or shape keys keep the session uid of their original mesh between frames
+        key = None
+        if obj.type == 'MESH' and len(obj.original.modifiers) == 0 and obj.original.data.shape_keys is None:
+            key = obj.data.session_uid
+        if key is not None and key in mesh_hashes:
+            hasher.update(mesh_hashes[key])
+            continue
+
+        mesh_hasher = hashlib.sha256()
+        if obj.type == 'MESH':
+            hash_mesh(mesh_hasher, obj.data)
+        else:
+            hash_mesh(mesh_hasher, obj.to_mesh())
+            obj.to_mesh_clear()
+
+        if key is not None:
+            mesh_hashes[key] = mesh_hasher.digest()
+        hasher.update(mesh_hasher.digest())
+
+    for material_name, material in sorted(materials.items()):
+        hasher.update(material_name.encode())
+        hash_struct(hasher, material)
+        hash_node_tree(hasher, material.node_tree, visited_node_trees)
+
+    return hasher.hexdigest()
+
+
+def symmetry_corners(context):
+    renderable_object_types = {'FONT', 'MESH', 'META', 'SURFACE'}
+
+    rotation_origin = bpy.data.objects["The Sims Rotation Origin"]
+
+    labels = dict()
+    corners = list()
+
+    depsgraph = context.evaluated_depsgraph_get()
+    for instance in depsgraph.object_instances:
+        obj = instance.object
+        instancer = instance.parent.original if instance.is_instance else obj.original
+        if instancer.hide_render or not instancer.visible_camera:
+            continue
+
+        matrix = numpy.array(instance.matrix_world, dtype=numpy.float64)
+
+        if obj.type == 'LIGHT':
+            # lights parented to the rotation origin turn with the camera and do not affect the symmetry
+            parent = obj.original.parent
+            while parent is not None and parent != rotation_origin:
+                parent = parent.parent
+            if parent == rotation_origin:
+                continue
+            light_hasher = hashlib.sha256()
+            hash_struct(light_hasher, obj.data)
+            label = labels.setdefault(light_hasher.hexdigest(), len(labels))
+
+            # a sun only has a direction, spot and area lights have a position and a direction,
+            # and an area light also has the orientation of its shape
+            location = matrix[:3, 3]
+            if obj.data.type == 'SUN':
+                location = numpy.array(rotation_origin.location, dtype=numpy.float64)
+            else:
+                corners.append(numpy.array([[label, *location, 0, 0]]))
+            axes = list()
+            if obj.data.type != 'POINT':
+                axes.append((2, -1))
+            if obj.data.type == 'AREA':
+                axes.append((0, 1))
+            for axis, sign in axes:
+                direction = sign * matrix[:3, axis] / numpy.linalg.norm(matrix[:3, axis])
+                axis_label = labels.setdefault(light_hasher.hexdigest() + " axis {}".format(axis), len(labels))
+                corners.append(numpy.array([[axis_label, *(location + direction), 0, 0]]))
+            continue
+
+        if obj.type not in renderable_object_types:
+            continue
+
+        mesh = obj.data if obj.type == 'MESH' else obj.to_mesh()
+
+        vertices = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float64)
+        mesh.vertices.foreach_get("co", vertices)
+        vertices = vertices.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+
+        loop_vertices = numpy.empty(len(mesh.loops), dtype=numpy.int32)
+        mesh.loops.foreach_get("vertex_index", loop_vertices)
+
+        polygon_materials = numpy.empty(len(mesh.polygons), dtype=numpy.int32)
+        mesh.polygons.foreach_get("material_index", polygon_materials)
+        polygon_loop_totals = numpy.empty(len(mesh.polygons), dtype=numpy.int32)
+        mesh.polygons.foreach_get("loop_total", polygon_loop_totals)
+
+        slot_labels = [
+            labels.setdefault(slot.material.original.name_full if slot.material is not None else "", len(labels))
+            for slot in obj.material_slots
+        ]
+        if len(slot_labels) == 0:
+            slot_labels = [labels.setdefault("", len(labels))]
+        slot_labels = numpy.array(slot_labels, dtype=numpy.float64)
+        loop_labels = slot_labels[
+            numpy.minimum(numpy.repeat(polygon_materials, polygon_loop_totals), len(slot_labels) - 1)
+        ]
+
+        uvs = numpy.zeros(len(mesh.loops) * 2, dtype=numpy.float64)
+        for uv_layer in mesh.uv_layers:
+            if uv_layer.active_render:
+                uv_layer.data.foreach_get("uv", uvs)
+        uvs = uvs.reshape(-1, 2)
+
+        corners.append(numpy.column_stack((loop_labels, vertices[loop_vertices], uvs)))
+
+        if obj.type != 'MESH':
+            obj.to_mesh_clear()
+
+    if len(corners) == 0:
+        return numpy.empty((0, 6))
+
+    corners = numpy.concatenate(corners)
+    corners[:, 1] -= rotation_origin.location.x
+    corners[:, 2] -= rotation_origin.location.y
+    return corners
+
+
+def is_symmetric(corners, angle):
+    TOLERANCE = 0.0001
+
+    rotated_corners = corners.copy()
+    if angle == 90:
+        rotated_corners[:, 1] = -corners[:, 2]
+        rotated_corners[:, 2] = corners[:, 1]
+    else:
+        rotated_corners[:, 1] = -corners[:, 1]
+        rotated_corners[:, 2] = -corners[:, 2]
+
+    corners = numpy.round(corners / TOLERANCE)
+    rotated_corners = numpy.round(rotated_corners / TOLERANCE)
+
+    corners = corners[numpy.lexsort(corners.T[::-1])]
+    rotated_corners = rotated_corners[numpy.lexsort(rotated_corners.T[::-1])]
+    return numpy.array_equal(corners, rotated_corners)
+
+
+def detect_symmetry(context):
+    # environment textures turn with the world, not the camera
+    world = context.scene.world
+    if world is not None and world.node_tree is not None:
+        for node in world.node_tree.nodes:
+            if node.bl_idname in {'ShaderNodeTexEnvironment', 'ShaderNodeTexSky'}:
+                return 'NONE'
+
+    corners = symmetry_corners(context)
+    if len(corners) == 0:
+        return 'NONE'
+
+    if context.scene.tsr_x == context.scene.tsr_y and is_symmetric(corners, 90):
+        return 'ROTATE_90'
+    if is_symmetric(corners, 180):
+        return 'ROTATE_180'
+    return 'NONE'
+
+
+def rotation_fingerprint(frame_fingerprint, object_name, direction, rotation):
+    hasher = hashlib.sha256()
+    hasher.update(repr((frame_fingerprint, object_name, direction, rotation)).encode())
+    return hasher.hexdigest()
+
+
+def rotation_output_names(context, direction):
+    names = [direction + "_color.png", direction + "_alpha.exr"]
+    for size in ("small", "medium", "large"):
+        names.append(size + "_" + direction + "_depth.exr")
+        if hasattr(bpy.app, "tsr_depth") is False:
+            names.append(size + "_" + direction + "_depth_extra.exr")
+    if context.scene.tsr_crop_to_border:
+        names.append(crop_sidecar_name(direction))
+    return names
+
+
+def remove_rotation_outputs(context, frame_directory_abs, direction):
+    for name in rotation_output_names(context, direction) + [crop_sidecar_name(direction)]:
+        if os.path.isfile(frame_directory_abs + name):
+            os.remove(frame_directory_abs + name)
+
+
+def link_or_copy_file(source_path, target_path):
+    if os.path.isfile(target_path):
+        os.remove(target_path)
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        shutil.copy2(source_path, target_path)
+
+
+def render_cache_path(object_name):
+    return bpy.path.abspath("//") + object_name + " - render cache.json"
+
+
+def load_render_cache(object_name):
+    if os.path.isfile(render_cache_path(object_name)) is False:
+        return dict()
+    with open(render_cache_path(object_name), encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_render_cache(object_name, render_cache):
+    with open(render_cache_path(object_name) + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(render_cache, file, ensure_ascii=False, indent=2)
+    os.replace(render_cache_path(object_name) + ".tmp", render_cache_path(object_name))
+
+
+def enabled_rotations(context):
+    rotations = list()
+    if context.scene.tsr_render_nw:
+        rotations.append(("nw", 0))
+    if context.scene.tsr_render_ne:
+        rotations.append(("ne", -90))
+    if context.scene.tsr_render_se:
+        rotations.append(("se", -180))
+    if context.scene.tsr_render_sw:
+        rotations.append(("sw", -270))
+    return rotations
+
+
+def compute_borders(context, rotations, border_cache):
+    with timing.stage("border", rotations=len(rotations)):
+        if context.scene.tsr_precise_border:
+            return compute_precise_render_borders(context, rotations, border_cache)
+        return compute_render_borders(context, rotations, border_cache)
+
+
+def widen_frame_range(context):
+    context.scene.tsr_frame_range_start = min(context.scene.tsr_frame_range_start, context.scene.frame_start)
+    context.scene.tsr_frame_range_end = max(context.scene.tsr_frame_range_end, context.scene.frame_end)
+
+
+def plan_frames(context, object_name, render_cache, dry_run=False):
+    # a dry run leaves the outputs on disk and the frame range of the object description as they are
+    if dry_run is False:
+        widen_frame_range(context)
+
+    rotations = enabled_rotations(context)
+
+    mesh_hashes = dict()
+
+    frames = range(context.scene.frame_start, context.scene.frame_end + 1)
+
+    marker_names = frame_marker_names(context)
+    frame_names = dict()
+    for frame in frames:
+        frame_names[frame] = marker_names.get(frame, "{}".format(frame))
+
+    # frames that evaluate to the same scene as an earlier frame are copied from it instead of rendered
+    frame_fingerprints = dict()
+    duplicate_frames = dict()
+    if context.scene.tsr_deduplicate_frames:
+        first_frames = dict()
+        for frame in frames:
+            context.scene.frame_set(frame)
+            frame_fingerprints[frame] = frame_fingerprint(context, mesh_hashes)
+            if frame_fingerprints[frame] in first_frames:
+                duplicate_frames[frame] = first_frames[frame_fingerprints[frame]]
+            else:
+                first_frames[frame_fingerprints[frame]] = frame
+
+    for frame in frames:
+        frame_name = frame_names[frame]
+
+        frame_directory = object_name + " - full sprites/" + frame_name + "/"
+
+        frame_directory_abs = bpy.path.abspath("//") + frame_directory
+
+        plan = {
+            "frame": frame,
+            "frame_name": frame_name,
+            "directory": frame_directory,
+            "staging": object_name + " - staging/" + frame_name + "/",
+            "fingerprint": None,
+            "duplicate_of": None,
+            "renders": list(),
+            "copies": list(),
+        }
+
+        if frame in duplicate_frames:
+            plan["duplicate_of"] = frame_names[duplicate_frames[frame]]
+            yield plan
+            continue
+
+        # the frame stays set while the plan is being rendered
+        context.scene.frame_set(frame)
+
+        pending_rotations = rotations
+
+        if context.scene.tsr_use_render_cache:
+            if frame in frame_fingerprints:
+                plan["fingerprint"] = frame_fingerprints[frame]
+            else:
+                plan["fingerprint"] = frame_fingerprint(context, mesh_hashes)
+            frame_cache = render_cache.setdefault(frame_name, dict())
+
+            enabled_directions = [direction for direction, _ in rotations]
+            for direction in ("nw", "ne", "se", "sw"):
+                if direction not in enabled_directions and dry_run is False:
+                    remove_rotation_outputs(context, frame_directory_abs, direction)
+                    frame_cache.pop(direction, None)
+
+            pending_rotations = list()
+            for direction, rotation in rotations:
+                outputs_exist = all(
+                    os.path.isfile(frame_directory_abs + name) for name in rotation_output_names(context, direction)
+                )
+                cached = frame_cache.get(direction) == rotation_fingerprint(
+                    plan["fingerprint"], object_name, direction, rotation
+                )
+                if outputs_exist and cached:
+                    continue
+                # the old outputs stay until the new ones are swapped in
+                if dry_run is False:
+                    frame_cache.pop(direction, None)
+                pending_rotations.append((direction, rotation))
+
+        symmetry = context.scene.tsr_symmetry
+        if symmetry == 'AUTO':
+            symmetry = detect_symmetry(context)
+
+        # rotations that look the same as a rotation already on disk or about to be rendered are copied
+        if symmetry != 'NONE':
+            symmetry_angle = 90 if symmetry == 'ROTATE_90' else 180
+            source_rotations = [rotation for rotation in rotations if rotation not in pending_rotations]
+            rendered_rotations = list()
+            for direction, rotation in pending_rotations:
+                source_direction = None
+                for other_direction, other_rotation in source_rotations:
+                    if (rotation - other_rotation) % symmetry_angle == 0:
+                        source_direction = other_direction
+                        break
+                if source_direction is None:
+                    rendered_rotations.append((direction, rotation))
+                    source_rotations.append((direction, rotation))
+                else:
+                    plan["copies"].append((source_direction, direction, rotation))
+            pending_rotations = rendered_rotations
+
+        plan["renders"] = pending_rotations
+
+        yield plan
+
+
+def finish_frame_plan(context, object_name, plan, render_cache):
+    frame_directory_abs = bpy.path.abspath("//") + plan["directory"]
+
+    if plan["duplicate_of"] is not None:
+        source_directory_abs = bpy.path.abspath("//") + object_name + " - full sprites/" + plan["duplicate_of"] + "/"
+        if os.path.isdir(frame_directory_abs):
+            shutil.rmtree(frame_directory_abs)
+        if os.path.isdir(source_directory_abs):
+            os.makedirs(frame_directory_abs, exist_ok=True)
+            for file_name in os.listdir(source_directory_abs):
+                link_or_copy_file(source_directory_abs + file_name, frame_directory_abs + file_name)
+
+        if context.scene.tsr_use_render_cache:
+            render_cache[plan["frame_name"]] = dict(render_cache.get(plan["duplicate_of"], dict()))
+            save_render_cache(object_name, render_cache)
+        return
+
+    if context.scene.tsr_use_render_cache is False:
+        enabled_directions = [direction for direction, _ in enabled_rotations(context)]
+        for direction in ("nw", "ne", "se", "sw"):
+            if direction not in enabled_directions:
+                remove_rotation_outputs(context, frame_directory_abs, direction)
+
+    for source_direction, direction, _ in plan["copies"]:
+        renamed = dict()
+        for source_name, name in zip(
+            rotation_output_names(context, source_direction), rotation_output_names(context, direction)
+        ):
+            if source_name == crop_sidecar_name(source_direction):
+                continue
+            renamed[source_name] = name
+            if os.path.isfile(frame_directory_abs + source_name):
+                link_or_copy_file(frame_directory_abs + source_name, frame_directory_abs + name)
+        if context.scene.tsr_crop_to_border:
+            copy_crop_sidecar(frame_directory_abs, source_direction, direction, renamed)
+        elif os.path.isfile(frame_directory_abs + crop_sidecar_name(direction)):
+            os.remove(frame_directory_abs + crop_sidecar_name(direction))
+
+    if context.scene.tsr_use_render_cache:
+        frame_cache = render_cache.setdefault(plan["frame_name"], dict())
+        for direction, rotation in plan["renders"]:
+            frame_cache[direction] = rotation_fingerprint(plan["fingerprint"], object_name, direction, rotation)
+        for _, direction, rotation in plan["copies"]:
+            frame_cache[direction] = rotation_fingerprint(plan["fingerprint"], object_name, direction, rotation)
+        save_render_cache(object_name, render_cache)
+
+
+def checkpoint_path(context):
+    return (
+        bpy.path.abspath("//")
+        + bpy.path.display_name_from_filepath(context.blend_data.filepath)
+        + " - render checkpoint.jsonl"
+    )
+
+
+def load_checkpoint(file_path):
+    completed = set()
+    if os.path.isfile(file_path) is False:
+        return completed
+
+    with open(file_path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # the last line of a killed render can be cut off
+                continue
+            completed.add((entry["directory"], entry["direction"], entry["pass"]))
+    return completed
+
+
+def begin_checkpoint(context, resume):
+    if resume is False:
+        remove_checkpoint(context)
+    return {"file_path": checkpoint_path(context), "completed": load_checkpoint(checkpoint_path(context))}
+
+
+def remove_checkpoint(context):
+    if os.path.isfile(checkpoint_path(context)):
+        os.remove(checkpoint_path(context))
+    for _, object_name in render_variants(context):
+        staging_directory_abs = bpy.path.abspath("//") + object_name + " - staging/"
+        if os.path.isdir(staging_directory_abs):
+            shutil.rmtree(staging_directory_abs)
+
+
+def save_checkpoint(checkpoint, job, job_pass):
+    # opened for every pass so render workers can append to the same file
+    entry = {"directory": job["directory"], "direction": job["direction"], "pass": job_pass}
+    with open(checkpoint["file_path"], "a", encoding="utf-8") as file:
+        file.write(json.dumps({"variant": job["variant"], "frame": job["frame"], **entry}, ensure_ascii=False) + "\n")
+    checkpoint["completed"].add((job["directory"], job["direction"], job_pass))
+
+
+def swap_rotation_outputs(context, staging_directory, frame_directory, direction):
+    # every file is replaced on its own, so a crash leaves either the old or the new file in place
+    staging_directory_abs = bpy.path.abspath("//") + staging_directory
+    frame_directory_abs = bpy.path.abspath("//") + frame_directory
+    if os.path.isdir(staging_directory_abs) is False:
+        return
+
+    os.makedirs(frame_directory_abs, exist_ok=True)
+    for name in rotation_output_names(context, direction):
+        if os.path.isfile(staging_directory_abs + name):
+            os.replace(staging_directory_abs + name, frame_directory_abs + name)
+
+    sidecar_path = frame_directory_abs + crop_sidecar_name(direction)
+    if context.scene.tsr_crop_to_border is False and os.path.isfile(sidecar_path):
+        os.remove(sidecar_path)
+
+
+def render_checkpointed_rotation(context, checkpoint, job, border, passes, is_last_passes):
+    # renders the passes no earlier run completed into the staging directory,
+    # which is swapped in once the last passes of the rotation are done
+    pending_passes = tuple(
+        job_pass for job_pass in passes if (job["directory"], job["direction"], job_pass) not in checkpoint["completed"]
+    )
+
+    if is_border_empty(border):
+        remove_rotation_outputs(context, bpy.path.abspath("//") + job["directory"], job["direction"])
+    elif len(pending_passes) > 0:
+        with timing.stage("rotation", passes=list(pending_passes)):
+            render_rotation(context, job["direction"], job["rotation"], job["staging"], border, pending_passes)
+
+    for job_pass in pending_passes:
+        save_checkpoint(checkpoint, job, job_pass)
+
+    if is_last_passes:
+        swap_rotation_outputs(context, job["staging"], job["directory"], job["direction"])
+
+
+def render_steps(context, checkpoint, splits=None):
+    # yields after every rotation so the render can be spread over multiple calls
+    border_cache = dict()
+
+    for variant_idx, object_name in render_variants(context):
+        set_variant(context, variant_idx)
+
+        render_cache = load_render_cache(object_name) if context.scene.tsr_use_render_cache else dict()
+
+        for plan in plan_frames(context, object_name, render_cache):
+            skipped = len(enabled_rotations(context)) - len(plan["renders"])
+            if skipped > 0:
+                yield ('SKIPPED', skipped)
+
+            if len(plan["renders"]) > 0:
+                with timing.job(variant=variant_name(context, variant_idx), frame=plan["frame"]):
+                    borders = compute_borders(context, [rotation for _, rotation in plan["renders"]], border_cache)
+                all_passes = rotation_passes(context)
+                for passes in all_passes:
+                    for direction, rotation in plan["renders"]:
+                        job = {
+                            "variant": variant_name(context, variant_idx),
+                            "frame": plan["frame"],
+                            "directory": plan["directory"],
+                            "staging": plan["staging"],
+                            "direction": direction,
+                            "rotation": rotation,
+                        }
+                        with timing.job(**timing_job_fields(job)):
+                            render_checkpointed_rotation(
+                                context, checkpoint, job, borders[rotation], passes, passes is all_passes[-1]
+                            )
+                        yield ('RENDERED', 1 if 'COLOR' in passes else 0)
+
+            finish_frame_plan(context, object_name, plan, render_cache)
+
+        # every frame of the variant is on disk, so the compiler can split it while the next variant renders
+        if splits is not None:
+            splits.append(
+                start_split(
+                    context,
+                    bpy.path.abspath("//"),
+                    bpy.path.display_name_from_filepath(context.blend_data.filepath),
+                    variant_name(context, variant_idx),
+                )
+            )
+
+
+def render_job_count(context):
+    frame_count = context.scene.frame_end - context.scene.frame_start + 1
+    return len(render_variants(context)) * frame_count * len(enabled_rotations(context))
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours > 0:
+        return "{}h {:02d}m".format(hours, minutes)
+    if minutes > 0:
+        return "{}m {:02d}s".format(minutes, seconds)
+    return "{}s".format(seconds)
+
+
+def is_gltf_variants_enabled(context):
+    return (
+        "io_scene_gltf2" in context.preferences.addons
+        and context.preferences.addons["io_scene_gltf2"].preferences.KHR_materials_variants_ui
+    )
+
+
+def render_variants(context):
+    object_name = bpy.path.display_name_from_filepath(context.blend_data.filepath)
+
+    if not is_gltf_variants_enabled(context) or len(context.scene.gltf2_KHR_materials_variants_variants) == 0:
+        return [(None, object_name)]
+
+    if context.scene.gltf2_active_variant >= len(context.scene.gltf2_KHR_materials_variants_variants):
+        context.scene.gltf2_active_variant = len(context.scene.gltf2_KHR_materials_variants_variants) - 1
+
+    variants = list()
+    for variant in context.scene.gltf2_KHR_materials_variants_variants:
+        if not context.scene.tsr_render_all_variants and variant.variant_idx != context.scene.gltf2_active_variant:
+            continue
+        variants.append((variant.variant_idx, object_name + " - " + variant.name))
+    return variants
+
+
+def variant_name(context, variant_idx):
+    if variant_idx is None:
+        return None
+    for variant in context.scene.gltf2_KHR_materials_variants_variants:
+        if variant.variant_idx == variant_idx:
+            return variant.name
+    return None
+
+
+def set_variant(context, variant_idx):
+    if variant_idx is None or context.scene.gltf2_active_variant == variant_idx:
+        return
+    with timing.stage("variant_switch", variant=variant_idx):
+        context.scene.gltf2_active_variant = variant_idx
+        bpy.ops.scene.gltf2_display_variant()
+
+
+render_timing = {"start": None, "first_sample": None, "renders": list()}
+
+
+def render_timing_pre(scene, depsgraph=None):
+    render_timing["start"] = time.perf_counter()
+    render_timing["first_sample"] = None
+
+
+def render_timing_stats(stats):
+    # everything before the first sample is scene sync, shader compilation and bvh building
+    if render_timing["first_sample"] is None and "Sample" in stats:
+        render_timing["first_sample"] = time.perf_counter()
+
+
+def render_timing_post(scene, depsgraph=None):
+    if render_timing["start"] is None:
+        return
+    end_time = time.perf_counter()
+    first_sample = render_timing["first_sample"] if render_timing["first_sample"] is not None else end_time
+    render_timing["renders"].append((first_sample - render_timing["start"], end_time - first_sample))
+    # sampling includes the compositor, which runs before render post
+    timing.record("sync", first_sample - render_timing["start"])
+    timing.record("sample", end_time - first_sample, samples=scene.cycles.samples)
+    render_timing["start"] = None
+
+
+def begin_render_timing():
+    render_timing["start"] = None
+    render_timing["renders"] = list()
+    bpy.app.handlers.render_pre.append(render_timing_pre)
+    bpy.app.handlers.render_stats.append(render_timing_stats)
+    bpy.app.handlers.render_post.append(render_timing_post)
+
+
+def end_render_timing():
+    bpy.app.handlers.render_pre.remove(render_timing_pre)
+    bpy.app.handlers.render_stats.remove(render_timing_stats)
+    bpy.app.handlers.render_post.remove(render_timing_post)
+
+    renders = render_timing["renders"]
+    if len(renders) == 0:
+        return None
+
+    sync_seconds = [sync for sync, _ in renders]
+    sample_seconds = sum(sample for _, sample in renders)
+    summary = "Scene sync {:.2f} s on the first render".format(sync_seconds[0])
+    if len(renders) > 1:
+        summary += " and {:.2f} s on average after".format(sum(sync_seconds[1:]) / (len(renders) - 1))
+    return summary + ", sampling {:.2f} s over {} renders".format(sample_seconds, len(renders))
+
+
+def timing_job_fields(job):
+    return {
+        "job": job["directory"] + job["direction"],
+        "variant": job["variant"],
+        "frame": job["frame"],
+        "direction": job["direction"],
+        "rotation": job["rotation"],
+    }
+
+
+def active_timing_log():
+    return next((listener for listener in timing.listeners if isinstance(listener, timing.Log)), None)
+
+
+def begin_timing_log(context):
+    # a render that splits and compiles keeps one log for the whole chain
+    if context.scene.tsr_timing_log is False or active_timing_log() is not None:
+        return None
+
+    object_name = bpy.path.display_name_from_filepath(context.blend_data.filepath)
+    if object_name == "":
+        return None
+
+    log = timing.Log(bpy.path.abspath("//") + object_name + " - timing.jsonl", time.strftime("%Y%m%d-%H%M%S"))
+    timing.listeners.append(log)
+    return log
+
+
+def end_timing_log(report, log):
+    if log is None:
+        return
+    timing.listeners.remove(log)
+    log.close()
+    print(timing.summary(log.file_path, log.run))
+    report({'INFO'}, "[Timing] Written to " + log.file_path)
+
+
+def history_path(context):
+    file_path = bpy.path.abspath(context.preferences.addons["render_ts1"].preferences.history_path)
+    if file_path == "":
+        file_path = os.path.join(bpy.utils.user_resource('DATAFILES', path="render_ts1", create=True), "history.sqlite")
+    return file_path
+
+
+def scene_characteristics(context):
+    depsgraph = context.evaluated_depsgraph_get()
+
+    objects = 0
+    triangles = 0
+    for obj in context.scene.objects:
+        if obj.hide_render or obj.type not in {'MESH', 'CURVE', 'SURFACE', 'META', 'FONT'}:
+            continue
+        objects += 1
+        evaluated_obj = obj.evaluated_get(depsgraph)
+        mesh = evaluated_obj.to_mesh()
+        if mesh is not None:
+            mesh.calc_loop_triangles()
+            triangles += len(mesh.loop_triangles)
+        evaluated_obj.to_mesh_clear()
+
+    texture_bytes = 0
+    for image in bpy.data.images:
+        if image.users == 0 or image.type != 'IMAGE':
+            continue
+        width, height = image.size
+        texture_bytes += width * height * image.channels * (4 if image.is_float else 1)
+
+    return {
+        "object": bpy.path.display_name_from_filepath(context.blend_data.filepath),
+        "blend": context.blend_data.filepath,
+        "blender": bpy.app.version_string,
+        "x": context.scene.tsr_x,
+        "y": context.scene.tsr_y,
+        "samples": context.scene.cycles.samples,
+        "objects": objects,
+        "triangles": triangles,
+        "texture_bytes": texture_bytes,
+        "variants": len(render_variants(context)),
+        "frames": context.scene.frame_end - context.scene.frame_start + 1,
+        "rotations": len(enabled_rotations(context)),
+    }
+
+
+def estimated_job_seconds(context):
+    if os.path.isfile(history_path(context)) is False:
+        return None
+    return history.job_seconds(
+        history_path(context),
+        bpy.path.display_name_from_filepath(context.blend_data.filepath),
+        context.scene.tsr_x,
+        context.scene.tsr_y,
+        context.scene.cycles.samples,
+    )
+
+
+def begin_history(context):
+    if context.scene.tsr_history is False:
+        return None
+
+    file_path = history_path(context)
+    # the recorder only listens once the run exists, a failed insert leaves no listener behind
+    history_run = {
+        "file_path": file_path,
+        "run": history.begin_run(file_path, scene_characteristics(context)),
+        "recorder": history.Recorder(),
+        "start_time": time.perf_counter(),
+    }
+    timing.listeners.append(history_run["recorder"])
+    return history_run
+
+
+def end_history(history_run, finished):
+    if history_run is None:
+        return
+    timing.listeners.remove(history_run["recorder"])
+    history_run["recorder"].save(history_run["file_path"], history_run["run"])
+    # runs without seconds are left out of the estimates and regressions
+    if finished:
+        history.end_run(history_run["file_path"], history_run["run"], time.perf_counter() - history_run["start_time"])
+
+
+def begin_render(context):
+    with timing.stage("update"):
+        update(context.scene, context)
+
+    state = {
+        "frame": context.scene.frame_current,
+        "rotation": copy.copy(bpy.data.objects["The Sims Rotation Origin"].rotation_euler),
+        "film_transparent": context.scene.render.film_transparent,
+        "use_pass_z": context.view_layer.use_pass_z,
+        "camera": context.scene.camera,
+        "resolution_x": context.scene.render.resolution_x,
+        "resolution_y": context.scene.render.resolution_y,
+        "use_border": context.scene.render.use_border,
+        "use_crop_to_border": context.scene.render.use_crop_to_border,
+        "border_min_x": context.scene.render.border_min_x,
+        "border_max_x": context.scene.render.border_max_x,
+        "border_min_y": context.scene.render.border_min_y,
+        "border_max_y": context.scene.render.border_max_y,
+        "variant": getattr(context.scene, "gltf2_active_variant", None),
+        "use_persistent_data": context.scene.render.use_persistent_data,
+        "image_settings": {
+            name: getattr(context.scene.render.image_settings, name) for name in image_format_properties()
+        },
+    }
+
+    context.scene.render.film_transparent = True
+    context.view_layer.use_pass_z = True
+
+    context.scene.render.use_border = True
+    context.scene.render.use_crop_to_border = context.scene.tsr_crop_to_border
+
+    # cycles keeps the synced scene and bvh between renders and updates what the depsgraph tags as changed
+    context.scene.render.use_persistent_data = context.scene.tsr_persistent_data
+    if context.scene.tsr_persistent_data or len(timing.listeners) > 0:
+        begin_render_timing()
+        state["render_timing"] = None
+
+    bpy.ops.tsr.set_render_resolution_and_camera()
+
+    depth_override_material = bpy.data.materials.new(name="The Sims Depth Override")
+    depth_override_material.use_nodes = True
+    depth_override_material.node_tree.nodes.remove(depth_override_material.node_tree.nodes["Principled BSDF"])
+
+    if hasattr(bpy.app, "tsr_depth") is False:
+        camera_data_node = depth_override_material.node_tree.nodes.new(type='ShaderNodeCameraData')
+        depth_override_material.node_tree.links.new(
+            camera_data_node.outputs[1],
+            depth_override_material.node_tree.nodes["Material Output"].inputs[0],
+        )
+
+    state["depth_override_material"] = depth_override_material
+
+    state["viewport_modifiers"] = list()
+
+    # the temporary view layers and nodes are removed again if the setup fails part way
+    try:
+        if context.scene.tsr_precise_border:
+            state["viewport_modifiers"] = match_viewport_modifiers_to_render(context)
+
+        if context.scene.tsr_single_render:
+            setup_single_render(context, depth_override_material)
+        elif context.scene.tsr_capture_in_memory:
+            state["capture"] = True
+            setup_capture(context)
+
+        apply_output_profile(context)
+    except Exception:
+        end_render(context, state)
+        raise
+
+    return state
+
+
+def end_render(context, state):
+    if is_gltf_variants_enabled(context) and len(context.scene.gltf2_KHR_materials_variants_variants) > 0:
+        set_variant(context, min(state["variant"], len(context.scene.gltf2_KHR_materials_variants_variants) - 1))
+
+    context.scene.frame_current = state["frame"]
+    bpy.data.objects["The Sims Rotation Origin"].rotation_euler = state["rotation"]
+    context.scene.render.film_transparent = state["film_transparent"]
+    context.view_layer.use_pass_z = state["use_pass_z"]
+    context.scene.camera = state["camera"]
+    context.scene.render.resolution_x = state["resolution_x"]
+    context.scene.render.resolution_y = state["resolution_y"]
+    context.scene.render.use_border = state["use_border"]
+    context.scene.render.use_crop_to_border = state["use_crop_to_border"]
+    context.scene.render.use_persistent_data = state["use_persistent_data"]
+    if "render_timing" in state:
+        state["render_timing"] = end_render_timing()
+    context.scene.render.border_min_x = state["border_min_x"]
+    context.scene.render.border_max_x = state["border_max_x"]
+    context.scene.render.border_min_y = state["border_min_y"]
+    context.scene.render.border_max_y = state["border_max_y"]
+
+    if context.scene.tsr_single_render:
+        remove_single_render(context)
+    if "capture" in state:
+        remove_capture(context)
+
+    for name in image_format_properties():
+        setattr(context.scene.render.image_settings, name, state["image_settings"][name])
+
+    restore_viewport_modifiers(state["viewport_modifiers"])
+
+    bpy.data.materials.remove(state["depth_override_material"])
+
+
+def render_jobs(context, jobs, checkpoint):
+    border_cache = dict()
+    current_frame = None
+
+    for job in jobs:
+        set_variant(context, job["variant_idx"])
+        if current_frame != job["frame"]:
+            context.scene.frame_set(job["frame"])
+            current_frame = job["frame"]
+
+        with timing.job(**timing_job_fields(job)):
+            borders = compute_borders(context, [job["rotation"]], border_cache)
+            render_checkpointed_rotation(context, checkpoint, job, borders[job["rotation"]], ('DEPTH', 'COLOR'), True)
+
+
+def render_worker(manifest_path, worker_index):
+    with open(manifest_path, encoding="utf-8") as file:
+        manifest = json.load(file)
+
+    context = bpy.context
+
+    # workers append to the log of the render that started them
+    log = None
+    if manifest["timing_log"] is not None:
+        log = timing.Log(*manifest["timing_log"])
+        timing.listeners.append(log)
+
+    # and record their jobs in the run of the render that started them
+    recorder = None
+    if manifest["history"] is not None:
+        recorder = history.Recorder()
+        timing.listeners.append(recorder)
+
+    checkpoint = {"file_path": manifest["checkpoint"], "completed": load_checkpoint(manifest["checkpoint"])}
+
+    # the jobs a failed worker completed are still recorded
+    try:
+        state = begin_render(context)
+        try:
+            render_jobs(context, manifest["jobs"][worker_index], checkpoint)
+        finally:
+            end_render(context, state)
+    finally:
+        if log is not None:
+            timing.listeners.remove(log)
+            log.close()
+        if recorder is not None:
+            timing.listeners.remove(recorder)
+            recorder.save(*manifest["history"])
+
+
+def partition_jobs(jobs, worker_count):
+    # every job of a frame directory goes to the same worker, so no two workers write to one directory
+    directory_jobs = dict()
+    for job in jobs:
+        directory_jobs.setdefault(job["directory"], list()).append(job)
+
+    worker_jobs = [list() for _ in range(min(worker_count, len(directory_jobs)))]
+    for jobs_of_directory in sorted(directory_jobs.values(), key=len, reverse=True):
+        min(worker_jobs, key=len).extend(jobs_of_directory)
+    return worker_jobs
+
+
+def run_render_workers(context, jobs, checkpoint, history_run=None):
+    # returns the errors of the failed workers
+    source_directory = bpy.path.abspath("//")
+    object_name = bpy.path.display_name_from_filepath(context.blend_data.filepath)
+
+    worker_jobs = partition_jobs(jobs, context.scene.tsr_render_processes)
+    worker_count = len(worker_jobs)
+    if worker_count == 0:
+        return list()
+
+    # workers render a copy saved next to the blend file so relative paths resolve to the same directory
+    worker_file_path = source_directory + object_name + " - render worker.blend"
+    manifest_path = source_directory + object_name + " - render jobs.json"
+
+    bpy.ops.wm.save_as_mainfile(filepath=worker_file_path, copy=True)
+
+    with open(manifest_path, "w", encoding="utf-8") as file:
+        log = active_timing_log()
+        json.dump(
+            {
+                "jobs": worker_jobs,
+                "timing_log": None if log is None else [log.file_path, log.run],
+                "history": None if history_run is None else [history_run["file_path"], history_run["run"]],
+                "checkpoint": checkpoint["file_path"],
+            },
+            file,
+            ensure_ascii=False,
+            indent=2,
+        )
+
+    threads = max(1, (os.cpu_count() or 1) // worker_count)
+
+    workers = list()
+    for worker_index in range(worker_count):
+        error_file = tempfile.TemporaryFile()
+        process = subprocess.Popen(
+            [
+                bpy.app.binary_path,
+                "--background",
+                worker_file_path,
+                "--threads",
+                str(threads),
+                "--addons",
+                __name__,
+                "--python-exit-code",
+                "1",
+                "--python-expr",
+                "import importlib; importlib.import_module({!r}).render_worker({!r}, {})".format(
+                    __name__, manifest_path, worker_index
+                ),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=error_file,
+        )
+        workers.append((process, error_file))
+
+    errors = list()
+    for process, error_file in workers:
+        process.wait()
+        error_file.seek(0)
+        if process.returncode != 0:
+            errors.append(error_file.read().decode("utf-8", errors="replace"))
+        error_file.close()
+
+    os.remove(manifest_path)
+    os.remove(worker_file_path)
+
+    return errors
+
+
+def can_render(report, context):
+    if context.scene.render.engine != "CYCLES":
+        report({'ERROR'}, "[Render] Rendering is only supported with Cycles")
+        return False
+
+    if bpy.path.display_name_from_filepath(context.blend_data.filepath) == "":
+        report({'ERROR'}, "Please save your blend file")
+        return False
+
+    return True
+
+
+def render(report, context, resume=False):
+    if not can_render(report, context):
+        return
+
+    log = None
+    history_run = None
+    finished = False
+    try:
+        log = begin_timing_log(context)
+        history_run = begin_history(context)
+
+        splits = None
+        if is_pipeline_split_enabled(context):
+            # the splits start before every frame is planned, so the description needs the new frames first
+            widen_frame_range(context)
+            write_object_description(context)
+            splits = list()
+
+        checkpoint = begin_checkpoint(context, resume)
+        state = begin_render(context)
+
+        if context.scene.tsr_render_processes > 1:
+            plans = list()
+            jobs = list()
+            try:
+                for variant_idx, object_name in render_variants(context):
+                    set_variant(context, variant_idx)
+                    render_cache = load_render_cache(object_name) if context.scene.tsr_use_render_cache else dict()
+                    for plan in plan_frames(context, object_name, render_cache):
+                        plans.append((object_name, plan, render_cache))
+                        for direction, rotation in plan["renders"]:
+                            jobs.append(
+                                {
+                                    "variant_idx": variant_idx,
+                                    "variant": variant_name(context, variant_idx),
+                                    "frame": plan["frame"],
+                                    "directory": plan["directory"],
+                                    "staging": plan["staging"],
+                                    "direction": direction,
+                                    "rotation": rotation,
+                                }
+                            )
+            finally:
+                end_render(context, state)
+
+            errors = run_render_workers(context, jobs, checkpoint, history_run)
+            for error in errors:
+                report({'ERROR'}, "[Render] " + error)
+
+            # only frames whose every rotation is in the checkpoint are recorded in the render cache,
+            # the others keep their staged outputs for a resumed render
+            completed = load_checkpoint(checkpoint["file_path"])
+            finished_frames = set()
+            for object_name, plan, render_cache in plans:
+                if plan["duplicate_of"] is not None:
+                    if (object_name, plan["duplicate_of"]) not in finished_frames:
+                        continue
+                elif any(
+                    (plan["directory"], direction, job_pass) not in completed
+                    for direction, _ in plan["renders"]
+                    for job_pass in ('DEPTH', 'COLOR')
+                ):
+                    continue
+                finish_frame_plan(context, object_name, plan, render_cache)
+                finished_frames.add((object_name, plan["frame_name"]))
+
+            # the jobs of a failed worker can be resumed
+            if len(errors) > 0:
+                return
+        else:
+            steps = render_steps(context, checkpoint, splits)
+            try:
+                for _ in steps:
+                    pass
+            except Exception:
+                cancel_splits(splits or ())
+                raise
+            finally:
+                end_render(context, state)
+
+        remove_checkpoint(context)
 
-    output_dir = bpy.path.abspath("//") + output_dir
-    import glob
+        if state.get("render_timing") is not None:
+            report({'INFO'}, "[Render] " + state["render_timing"])
 
-    color_matches = glob.glob(output_dir + "color*.png") + glob.glob(output_dir + "color*.PNG")
-    if color_matches:
-        os.replace(color_matches[0], output_dir + direction + "_color.png")
+        if context.scene.tsr_auto_split:
+            split(report, context, splits or ())
 
-    # Fixed to catch both lowercase .exr and uppercase .EXR on Linux
-    alpha_matches = glob.glob(output_dir + "alpha*.exr") + glob.glob(output_dir + "alpha*.EXR")
-    if alpha_matches:
-        os.replace(alpha_matches[0], output_dir + direction + "_alpha.exr")
+        finished = True
+    finally:
+        end_history(history_run, finished)
+        end_timing_log(report, log)
 
 
-def render_depth(context, size, direction, rotation, output_dir, extra):
-    bpy.ops.render.render(animation=False)
+# a render in the modal operator keeps the scene in its render state until it finishes,
+# so no other render, plan or comparison may start in between
+modal_render = {"running": False}
 
-    output_dir = bpy.path.abspath("//") + output_dir
-    import glob
 
-    file_name = "_depth.exr" if extra is False else "_depth_extra.exr"
+class TS1R_OT_render(bpy.types.Operator):
+    """Render all frames in the current frame range. Press Esc to cancel"""
 
-    # Fixed to catch both lowercase .exr and uppercase .EXR on Linux
-    depth_matches = glob.glob(output_dir + "depth*.exr") + glob.glob(output_dir + "depth*.EXR")
-    if depth_matches:
-        os.replace(depth_matches[0], output_dir + size + "_" + direction + file_name)
+    bl_idname = "tsr.render"
+    bl_label = "Render"
+    bl_options = {'REGISTER'}
 
+    @classmethod
+    def poll(cls, context):
+        return modal_render["running"] is False
 
-def render_rotation(context, direction, rotation, output_dir):
-    bpy.data.objects["The Sims Rotation Origin"].rotation_euler = (
-        0,
-        0,
-        math.radians(rotation),
+    resume: bpy.props.BoolProperty(
+        name="Resume",
+        description="Skip the jobs an interrupted render completed and keep its staged outputs",
+        default=False,
+        options={'SKIP_SAVE'},
     )
-    context.view_layer.update()
 
-    border_min_x = 1
-    border_max_x = 0
-    border_min_y = 1
-    border_max_y = 0
-
-    for obj in context.view_layer.objects:
-        renderable_object_types = ['FONT', 'MESH', 'META', 'SURFACE']
-        if obj.hide_render is False and obj.visible_camera and obj.type in renderable_object_types:
-            vertices = [mathutils.Vector(vertex) for vertex in obj.bound_box]
-            world_vertices = [obj.matrix_world @ vertex for vertex in vertices]
-
-            object_min_x = 1
-            object_max_x = 0
-            object_min_y = 1
-            object_max_y = 0
-
-            for vertex in world_vertices:
-                view_coord = bpy_extras.object_utils.world_to_camera_view(context.scene, context.scene.camera, vertex)
-                object_min_x = min(object_min_x, view_coord[0])
-                object_max_x = max(object_max_x, view_coord[0])
-                object_min_y = min(object_min_y, view_coord[1])
-                object_max_y = max(object_max_y, view_coord[1])
-
-            border_min_x = max(0, min(border_min_x, object_min_x))
-            border_max_x = min(1, max(border_max_x, object_max_x))
-            border_min_y = max(0, min(border_min_y, object_min_y))
-            border_max_y = min(1, max(border_max_y, object_max_y))
-
-    if border_min_x >= border_max_x or border_min_y >= border_max_y:
-        return
+    def execute(self, context):
+        render(self.report, context, self.resume)
 
-    BORDER_PADDING = 0.01
-    context.scene.render.border_min_x = max(0, border_min_x - BORDER_PADDING)
-    context.scene.render.border_max_x = min(1, border_max_x + BORDER_PADDING)
-    context.scene.render.border_min_y = max(0, border_min_y - BORDER_PADDING)
-    context.scene.render.border_max_y = min(1, border_max_y + BORDER_PADDING)
+        return {'FINISHED'}
 
-    if bpy.app.version[0] >= 5:
-        scene_node_tree = context.scene.compositing_node_group
-    else:
-        scene_node_tree = context.scene.node_tree
+    def invoke(self, context, event):
+        if bpy.app.background or context.scene.tsr_render_processes > 1:
+            return self.execute(context)
 
-    render_group_node_tree = scene_node_tree.nodes.get("The Sims Renderer").node_tree
-    input_node = render_group_node_tree.nodes.get("The Sims Input")
-    alpha_convert_node = render_group_node_tree.nodes.get("The Sims Alpha Convert")
-    color_output_node = render_group_node_tree.nodes.get("The Sims Color Output")
-    alpha_output_node = render_group_node_tree.nodes.get("The Sims Alpha Output")
-    depth_output_node = render_group_node_tree.nodes.get("The Sims Depth Output")
+        if not can_render(self.report, context):
+            return {'FINISHED'}
 
-    depth_group_node_tree = scene_node_tree.nodes.get("The Sims Renderer Pre Depth").node_tree
-    depth_switch_node = depth_group_node_tree.nodes.get("The Sims Depth Switch")
+        self.log = None
+        self.history_run = None
+        self.state = None
+        try:
+            self.log = begin_timing_log(context)
+            self.history_run = begin_history(context)
+            self.estimated_job_seconds = estimated_job_seconds(context)
+
+            self.splits = None
+            if is_pipeline_split_enabled(context):
+                widen_frame_range(context)
+                write_object_description(context)
+                self.splits = list()
+
+            self.checkpoint = begin_checkpoint(context, self.resume)
+            self.state = begin_render(context)
+            self.steps = render_steps(context, self.checkpoint, self.splits)
+            self.job_count = render_job_count(context)
+        except Exception:
+            # the modal cleanup never runs, so the listeners must not outlive this render
+            if self.state is not None:
+                end_render(context, self.state)
+            end_history(self.history_run, False)
+            end_timing_log(self.report, self.log)
+            raise
+        self.jobs_done = 0
+        self.jobs_rendered = 0
+        self.render_seconds = 0
+
+        context.window_manager.progress_begin(0, max(1, self.job_count))
+        self.timer = context.window_manager.event_timer_add(0.01, window=context.window)
+        context.window_manager.modal_handler_add(self)
+        modal_render["running"] = True
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.finish(context)
+            cancel_splits(self.splits or ())
+            end_history(self.history_run, False)
+            end_timing_log(self.report, self.log)
+            self.report({'WARNING'}, "[Render] Cancelled")
+            return {'CANCELLED'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        start_time = time.perf_counter()
+        try:
+            step, jobs = next(self.steps)
+        except StopIteration:
+            self.finish(context)
+            remove_checkpoint(context)
+            if self.state.get("render_timing") is not None:
+                self.report({'INFO'}, "[Render] " + self.state["render_timing"])
+            if context.scene.tsr_auto_split:
+                split(self.report, context, self.splits or ())
+            end_history(self.history_run, True)
+            end_timing_log(self.report, self.log)
+            return {'FINISHED'}
+        except Exception:
+            self.finish(context)
+            cancel_splits(self.splits or ())
+            end_history(self.history_run, False)
+            end_timing_log(self.report, self.log)
+            raise
+
+        self.jobs_done += jobs
+        if step == 'RENDERED':
+            self.jobs_rendered += jobs
+            self.render_seconds += time.perf_counter() - start_time
+
+        status = "Rendering {}/{}".format(self.jobs_done, self.job_count)
+        if self.jobs_rendered > 0:
+            remaining_seconds = (self.job_count - self.jobs_done) * self.render_seconds / self.jobs_rendered
+            status += ", {} remaining".format(format_duration(remaining_seconds))
+        elif self.estimated_job_seconds is not None:
+            remaining_seconds = (self.job_count - self.jobs_done) * self.estimated_job_seconds
+            status += ", about {} remaining".format(format_duration(remaining_seconds))
+        context.workspace.status_text_set(status + " (Esc to cancel)")
+        context.window_manager.progress_update(self.jobs_done)
+
+        return {'RUNNING_MODAL'}
+
+    def cancel(self, context):
+        # blender stops the modal render on its own when another blend file is loaded
+        modal_render["running"] = False
+        end_history(self.history_run, False)
+        end_timing_log(self.report, self.log)
+
+    def finish(self, context):
+        modal_render["running"] = False
+        self.steps.close()
+        context.window_manager.event_timer_remove(self.timer)
+        context.window_manager.progress_end()
+        context.workspace.status_text_set(None)
+        end_render(context, self.state)
+
+
+def performance_report(report, context):
+    REGRESSION_DAYS = 7
+    REGRESSION_THRESHOLD = 0.2
+
+    file_path = history_path(context)
+    if os.path.isfile(file_path) is False:
+        report({'ERROR'}, "[Performance] No runs have been recorded yet")
+        return
 
-    render_group_node_tree.links.new(input_node.outputs[2], depth_output_node.inputs[0])
+    regressions = history.regressions(file_path, REGRESSION_DAYS, REGRESSION_THRESHOLD)
+    for regression in regressions:
+        report({'WARNING'}, "[Performance] " + regression)
+    if len(regressions) == 0:
+        report({'INFO'}, "[Performance] No rotation got slower since {} days ago".format(REGRESSION_DAYS))
+
+    job_seconds = estimated_job_seconds(context)
+    if job_seconds is not None:
+        report(
+            {'INFO'},
+            "[Performance] A job of this object takes about {:.2f} s, {} for all {} jobs".format(
+                job_seconds, format_duration(job_seconds * render_job_count(context)), render_job_count(context)
+            ),
+        )
 
-    if bpy.app.version[0] >= 5:
-        depth_switch_node.inputs[0].default_value = hasattr(bpy.app, "tsr_depth")
-    else:
-        depth_switch_node.check = hasattr(bpy.app, "tsr_depth")
 
-    output_dir_relative = "//" + output_dir
+def job_passes(context):
+    # the renders of a job as the pass, resolution percentage and samples
+    samples = context.scene.cycles.samples
+    if context.scene.tsr_single_render:
+        return [("single", 200, samples)]
 
-    if bpy.app.version[0] >= 5:
-        color_output_node.directory = output_dir_relative
-        alpha_output_node.directory = output_dir_relative
-        depth_output_node.directory = output_dir_relative
-    else:
-        color_output_node.base_path = output_dir_relative
-        alpha_output_node.base_path = output_dir_relative
-        depth_output_node.base_path = output_dir_relative
+    depth_samples = samples if hasattr(bpy.app, "tsr_depth") else 1
+    depth_resolutions = [100] if context.scene.tsr_depth_pyramid else [25, 50, 100]
+    passes = [("depth", resolution, depth_samples) for resolution in depth_resolutions]
+    if hasattr(bpy.app, "tsr_depth") is False:
+        passes += [("depth_extra", resolution, depth_samples) for resolution in depth_resolutions]
 
-    original_cycles_max_bounces = context.scene.cycles.max_bounces
-    context.scene.cycles.max_bounces = 0
-    original_cycles_filter_width = context.scene.cycles.filter_width
-    context.scene.cycles.filter_width = 1
-    original_cycles_use_denoising = context.scene.cycles.use_denoising
-    context.scene.cycles.use_denoising = False
-    original_cycles_use_adaptive_sampling = context.scene.cycles.use_adaptive_sampling
-    context.scene.cycles.use_adaptive_sampling = False
+    if context.scene.tsr_color_strategy == 'HALF':
+        passes.append(("color", 100, max(1, round(samples * context.scene.tsr_color_sample_scale))))
+    else:
+        passes.append(("color", 200, samples))
+    return passes
 
-    original_cycles_samples = context.scene.cycles.samples
 
-    context.view_layer.material_override = bpy.data.materials["The Sims Depth Override"]
+def sprite_id_problems(context):
+    # every frame takes a sprite id for each tile of the object from its own
+    tile_count = context.scene.tsr_x * context.scene.tsr_y
+    frames = range(
+        min(context.scene.tsr_frame_range_start, context.scene.frame_start),
+        max(context.scene.tsr_frame_range_end, context.scene.frame_end) + 1,
+    )
+    # two frames with the same sprite id are the closest collision, so they are kept apart
+    sprite_ids = sorted((frame["sprite_id"], frame["name"]) for frame in frame_descriptions(context, frames))
+
+    problems = list()
+    for (sprite_id, frame_name), (next_sprite_id, next_frame_name) in zip(sprite_ids, sprite_ids[1:]):
+        if next_sprite_id == sprite_id:
+            problems.append("Frames {} and {} both use sprite ID {}".format(frame_name, next_frame_name, sprite_id))
+        elif next_sprite_id - sprite_id < tile_count:
+            problems.append(
+                "Sprite IDs {} and {} are closer than the {} tiles of the object".format(
+                    sprite_id, next_sprite_id, tile_count
+                )
+            )
+    return problems
 
-    original_resolution_percentage = context.scene.render.resolution_percentage
 
-    if hasattr(bpy.app, "tsr_depth") is False:
-        context.scene.cycles.samples = 1
+def plan_render(context):
+    problems = list()
 
-    context.scene.render.resolution_percentage = 25
-    render_depth(context, "small", direction, rotation, output_dir, False)
-    context.scene.render.resolution_percentage = 50
-    render_depth(context, "medium", direction, rotation, output_dir, False)
-    context.scene.render.resolution_percentage = 100
-    render_depth(context, "large", direction, rotation, output_dir, False)
+    preferences = context.preferences.addons["render_ts1"].preferences
+    if context.scene.tsr_auto_split and os.path.isfile(bpy.path.abspath(preferences.compiler_path)) is False:
+        problems.append("The compiler path is not set in the add-on preferences, the split after the render will fail")
+    if (
+        context.scene.tsr_auto_split
+        and context.scene.tsr_auto_compile
+        and os.path.isdir(bpy.path.abspath(preferences.the_sims_path)) is False
+    ):
+        problems.append("The Sims path is not set in the add-on preferences, the compile after the render will fail")
 
-    context.scene.cycles.samples = original_cycles_samples
+    problems += sprite_id_problems(context)
 
-    if hasattr(bpy.app, "tsr_depth") is False:
-        context.scene.render.resolution_percentage = 25
-        render_depth(context, "small", direction, rotation, output_dir, True)
-        context.scene.render.resolution_percentage = 50
-        render_depth(context, "medium", direction, rotation, output_dir, True)
-        context.scene.render.resolution_percentage = 100
-        render_depth(context, "large", direction, rotation, output_dir, True)
+    original_frame = context.scene.frame_current
+    original_variant = getattr(context.scene, "gltf2_active_variant", None)
+    original_resolution_x = context.scene.render.resolution_x
+    original_resolution_y = context.scene.render.resolution_y
+    original_camera = context.scene.camera
+
+    # a dry run leaves the blend file as it was, also when the planning fails
+    viewport_modifiers = list()
+    try:
+        # the borders are projected with the camera and resolution of the render
+        bpy.ops.tsr.set_render_resolution_and_camera()
+        resolution_x = context.scene.render.resolution_x
+        resolution_y = context.scene.render.resolution_y
+        if context.scene.tsr_precise_border:
+            viewport_modifiers = match_viewport_modifiers_to_render(context)
 
-    render_group_node_tree.links.remove(input_node.outputs[2].links[0])
+        passes = job_passes(context)
 
-    context.view_layer.material_override = None
+        jobs = list()
+        border_cache = dict()
+        for variant_idx, object_name in render_variants(context):
+            set_variant(context, variant_idx)
+            render_cache = load_render_cache(object_name) if context.scene.tsr_use_render_cache else dict()
 
-    context.scene.cycles.use_adaptive_sampling = original_cycles_use_adaptive_sampling
-    context.scene.cycles.use_denoising = original_cycles_use_denoising
-    context.scene.cycles.filter_width = original_cycles_filter_width
-    context.scene.cycles.max_bounces = original_cycles_max_bounces
+            for plan in plan_frames(context, object_name, render_cache, dry_run=True):
+                if len(plan["renders"]) == 0:
+                    continue
 
-    render_group_node_tree.links.new(input_node.outputs[0], alpha_convert_node.inputs[0])
-    render_group_node_tree.links.new(input_node.outputs[1], alpha_output_node.inputs[0])
+                borders = compute_borders(context, [rotation for _, rotation in plan["renders"]], border_cache)
+                for direction, rotation in plan["renders"]:
+                    job = {
+                        "variant": variant_name(context, variant_idx),
+                        "frame": plan["frame"],
+                        "directory": plan["directory"],
+                        "direction": direction,
+                        "rotation": rotation,
+                        "border": list(borders[rotation]),
+                        "passes": list(),
+                    }
+                    jobs.append(job)
+
+                    if is_border_empty(borders[rotation]):
+                        problems.append(
+                            "The {} rotation of frame {} has an empty border and would not be rendered".format(
+                                direction, plan["frame_name"]
+                            )
+                        )
+                        continue
+
+                    border_min_x, border_max_x, border_min_y, border_max_y = padded_border(context, borders[rotation])
+                    for name, resolution, samples in passes:
+                        width = round((border_max_x - border_min_x) * resolution_x * resolution / 100)
+                        height = round((border_max_y - border_min_y) * resolution_y * resolution / 100)
+                        job["passes"].append(
+                            {
+                                "pass": name,
+                                "resolution": resolution,
+                                "width": width,
+                                "height": height,
+                                "pixels": width * height,
+                                "samples": samples,
+                            }
+                        )
+    finally:
+        restore_viewport_modifiers(viewport_modifiers)
+        context.scene.render.resolution_x = original_resolution_x
+        context.scene.render.resolution_y = original_resolution_y
+        context.scene.camera = original_camera
+        if original_variant is not None and is_gltf_variants_enabled(context):
+            set_variant(context, original_variant)
+        context.scene.frame_set(original_frame)
+
+    job_seconds = estimated_job_seconds(context)
+
+    return {
+        "jobs": jobs,
+        "skipped": render_job_count(context) - len(jobs),
+        "pixels": sum(job_pass["pixels"] for job in jobs for job_pass in job["passes"]),
+        "samples": sum(job_pass["pixels"] * job_pass["samples"] for job in jobs for job_pass in job["passes"]),
+        "seconds": None if job_seconds is None else job_seconds * len(jobs),
+        "problems": problems,
+    }
 
-    context.scene.render.resolution_percentage = 200
-    render_color_and_alpha(context, direction, rotation, output_dir)
 
-    render_group_node_tree.links.remove(input_node.outputs[0].links[0])
-    render_group_node_tree.links.remove(input_node.outputs[1].links[0])
+def render_plan(report, context):
+    if not can_render(report, context):
+        return
 
-    context.scene.render.resolution_percentage = original_resolution_percentage
+    plan = plan_render(context)
 
+    object_name = bpy.path.display_name_from_filepath(context.blend_data.filepath)
+    plan_path = bpy.path.abspath("//") + object_name + " - render plan.json"
+    with open(plan_path, "w", encoding="utf-8") as file:
+        json.dump(plan, file, ensure_ascii=False, indent=2)
 
-def render_frames(context, object_name):
-    context.scene.tsr_frame_range_start = min(context.scene.tsr_frame_range_start, context.scene.frame_start)
-    context.scene.tsr_frame_range_end = max(context.scene.tsr_frame_range_end, context.scene.frame_end)
+    for problem in plan["problems"]:
+        report({'WARNING'}, "[Plan] " + problem)
 
-    for frame in range(context.scene.frame_start, context.scene.frame_end + 1):
-        context.scene.frame_set(frame)
+    summary = "{} jobs to render, {} skipped, {:.1f} megapixels".format(
+        len(plan["jobs"]), plan["skipped"], plan["pixels"] / 1e6
+    )
+    if plan["seconds"] is not None:
+        summary += ", about {}".format(format_duration(plan["seconds"]))
+    report({'INFO'}, "[Plan] " + summary + ". Written to " + plan_path)
 
-        frame_name = "{}".format(frame)
-        for marker in context.scene.timeline_markers:
-            if marker.frame == frame:
-                frame_name = marker.name
 
-        frame_directory = object_name + " - full sprites/" + frame_name + "/"
+class TS1R_OT_plan(bpy.types.Operator):
+    """List the jobs a render would run with their pixel counts and estimated time, and warn about problems"""
 
-        frame_directory_abs = bpy.path.abspath("//") + frame_directory
-        if os.path.isdir(frame_directory_abs):
-            shutil.rmtree(frame_directory_abs)
+    bl_idname = "tsr.plan"
+    bl_label = "Plan"
+    bl_options = {'REGISTER'}
 
-        if context.scene.tsr_render_nw:
-            render_rotation(context, "nw", 0, frame_directory)
-        if context.scene.tsr_render_ne:
-            render_rotation(context, "ne", -90, frame_directory)
-        if context.scene.tsr_render_se:
-            render_rotation(context, "se", -180, frame_directory)
-        if context.scene.tsr_render_sw:
-            render_rotation(context, "sw", -270, frame_directory)
+    @classmethod
+    def poll(cls, context):
+        return modal_render["running"] is False
 
+    def execute(self, context):
+        render_plan(self.report, context)
 
-def is_gltf_variants_enabled(context):
-    return (
-        "io_scene_gltf2" in context.preferences.addons
-        and context.preferences.addons["io_scene_gltf2"].preferences.KHR_materials_variants_ui
-    )
+        return {'FINISHED'}
 
 
-class TS1R_OT_render(bpy.types.Operator):
-    """Render all frames in the current frame range"""
+class TS1R_OT_performance_report(bpy.types.Operator):
+    """Report the rotations that got slower than in earlier runs and the estimated render time"""
 
-    bl_idname = "tsr.render"
-    bl_label = "Render"
+    bl_idname = "tsr.performance_report"
+    bl_label = "Performance Report"
     bl_options = {'REGISTER'}
 
     def execute(self, context):
-        if context.scene.render.engine != "CYCLES":
-            self.report({'ERROR'}, "[Render] Rendering is only supported with Cycles")
-            return {'FINISHED'}
+        performance_report(self.report, context)
 
-        if bpy.path.display_name_from_filepath(context.blend_data.filepath) == "":
-            self.report({'ERROR'}, "Please save your blend file")
-            return {'FINISHED'}
+        return {'FINISHED'}
 
-        update(self, context)
 
-        original_frame = context.scene.frame_current
-        original_rotation = copy.copy(bpy.data.objects["The Sims Rotation Origin"].rotation_euler)
-        original_render_film_transparent = context.scene.render.film_transparent
-        original_view_layer_use_pass_z = context.view_layer.use_pass_z
-        original_camera = context.scene.camera
-        original_render_resolution_x = context.scene.render.resolution_x
-        original_render_resolution_y = context.scene.render.resolution_y
-        original_render_use_border = context.scene.render.use_border
-        original_render_use_crop_to_border = context.scene.render.use_crop_to_border
-        original_render_border_min_x = context.scene.render.border_min_x
-        original_render_border_max_x = context.scene.render.border_max_x
-        original_render_border_min_y = context.scene.render.border_min_y
-        original_render_border_max_y = context.scene.render.border_max_y
-
-        context.scene.render.film_transparent = True
-        context.view_layer.use_pass_z = True
+def frame_marker_names(context):
+    # the last marker on a frame names it
+    return {marker.frame: marker.name for marker in context.scene.timeline_markers}
 
-        context.scene.render.use_border = True
-        context.scene.render.use_crop_to_border = False
 
-        bpy.ops.tsr.set_render_resolution_and_camera()
+def scene_fcurves(context):
+    animation_data = context.scene.animation_data
+    if animation_data is None or animation_data.action is None:
+        return dict()
 
-        depth_override_material = bpy.data.materials.new(name="The Sims Depth Override")
-        depth_override_material.use_nodes = True
-        depth_override_material.node_tree.nodes.remove(depth_override_material.node_tree.nodes["Principled BSDF"])
+    if bpy.app.version >= (4, 4, 0):
+        channelbag = bpy_extras.anim_utils.action_get_channelbag_for_slot(
+            animation_data.action, animation_data.action_slot
+        )
+        fcurves = channelbag.fcurves if channelbag is not None else list()
+    else:
+        fcurves = animation_data.action.fcurves
 
-        if hasattr(bpy.app, "tsr_depth") is False:
-            camera_data_node = depth_override_material.node_tree.nodes.new(type='ShaderNodeCameraData')
-            depth_override_material.node_tree.links.new(
-                camera_data_node.outputs[1],
-                depth_override_material.node_tree.nodes["Material Output"].inputs[0],
-            )
+    return {fcurve.data_path: fcurve for fcurve in fcurves if fcurve.array_index == 0}
 
-        object_name = bpy.path.display_name_from_filepath(context.blend_data.filepath)
 
-        if is_gltf_variants_enabled(context) and len(context.scene.gltf2_KHR_materials_variants_variants) > 0:
-            if context.scene.gltf2_active_variant >= len(context.scene.gltf2_KHR_materials_variants_variants):
-                context.scene.gltf2_active_variant = len(context.scene.gltf2_KHR_materials_variants_variants) - 1
+def is_sprite_id_evaluation_needed(context):
+    SPRITE_ID_PROPERTIES = ["tsr_sprite_id", "tsr_sprite_id_reverse_x", "tsr_sprite_id_reverse_y", "tsr_palette_id"]
 
-            original_variant = context.scene.gltf2_active_variant
+    animation_data = context.scene.animation_data
+    if animation_data is None:
+        return False
 
-            for variant in context.scene.gltf2_KHR_materials_variants_variants:
-                if (
-                    not context.scene.tsr_render_all_variants
-                    and variant.variant_idx != context.scene.gltf2_active_variant
-                ):
-                    continue
-                variant_object_name = object_name + " - " + variant.name
-                context.scene.gltf2_active_variant = variant.variant_idx
-                bpy.ops.scene.gltf2_display_variant()
-                render_frames(context, variant_object_name)
+    # drivers and nla strips are only applied by evaluating the scene
+    if any(driver.data_path in SPRITE_ID_PROPERTIES for driver in animation_data.drivers):
+        return True
+    return any(track.mute is False and len(track.strips) > 0 for track in animation_data.nla_tracks)
 
-            context.scene.gltf2_active_variant = original_variant
-            bpy.ops.scene.gltf2_display_variant()
-        else:
-            render_frames(context, object_name)
 
-        context.scene.frame_current = original_frame
-        bpy.data.objects["The Sims Rotation Origin"].rotation_euler = original_rotation
-        context.scene.render.film_transparent = original_render_film_transparent
-        context.view_layer.use_pass_z = original_view_layer_use_pass_z
-        context.scene.camera = original_camera
-        context.scene.render.resolution_x = original_render_resolution_x
-        context.scene.render.resolution_y = original_render_resolution_y
-        context.scene.render.use_border = original_render_use_border
-        context.scene.render.use_crop_to_border = original_render_use_crop_to_border
-        context.scene.render.border_min_x = original_render_border_min_x
-        context.scene.render.border_max_x = original_render_border_max_x
-        context.scene.render.border_min_y = original_render_border_min_y
-        context.scene.render.border_max_y = original_render_border_max_y
+def scene_property_at_frame(context, fcurves, name, frame):
+    fcurve = fcurves.get(name)
+    if fcurve is None or fcurve.mute:
+        return getattr(context.scene, name)
+    return fcurve.evaluate(frame)
 
-        bpy.data.materials.remove(depth_override_material)
 
-        if context.scene.tsr_auto_split:
-            split(self, context)
+def frame_descriptions(context, frames):
+    frame_id_map = list()
 
-        return {'FINISHED'}
+    marker_names = frame_marker_names(context)
 
+    evaluate_frames = is_sprite_id_evaluation_needed(context)
+    fcurves = dict() if evaluate_frames else scene_fcurves(context)
 
-def write_object_description(context):
     original_frame = context.scene.frame_current
 
-    object_description = dict()
-    object_description["dimensions"] = {
-        "x": context.scene.tsr_x,
-        "y": context.scene.tsr_y,
-    }
-    frame_id_map = list()
-
-    for frame in range(context.scene.tsr_frame_range_start, context.scene.tsr_frame_range_end + 1):
-        context.scene.frame_set(frame)
-        frame_name = "{}".format(frame)
-        for marker in context.scene.timeline_markers:
-            if marker.frame == frame:
-                frame_name = marker.name
+    for frame in frames:
+        if evaluate_frames:
+            context.scene.frame_set(frame)
 
+        # animated integer and boolean properties truncate the evaluated curve like blender does
         frame_id_map.append(
             {
-                "name": frame_name,
-                "sprite_id": context.scene.tsr_sprite_id,
-                "sprite_id_reverse_x": context.scene.tsr_sprite_id_reverse_x,
-                "sprite_id_reverse_y": context.scene.tsr_sprite_id_reverse_y,
-                "palette_id": context.scene.tsr_palette_id,
+                "name": marker_names.get(frame, "{}".format(frame)),
+                "sprite_id": int(scene_property_at_frame(context, fcurves, "tsr_sprite_id", frame)),
+                "sprite_id_reverse_x": bool(
+                    int(scene_property_at_frame(context, fcurves, "tsr_sprite_id_reverse_x", frame))
+                ),
+                "sprite_id_reverse_y": bool(
+                    int(scene_property_at_frame(context, fcurves, "tsr_sprite_id_reverse_y", frame))
+                ),
+                "palette_id": int(scene_property_at_frame(context, fcurves, "tsr_palette_id", frame)),
             }
         )
 
-    context.scene.frame_current = original_frame
+    if evaluate_frames:
+        context.scene.frame_current = original_frame
+
+    return frame_id_map
+
 
-    object_description["frames"] = frame_id_map
+def write_object_description(context):
+    object_description = dict()
+    object_description["dimensions"] = {
+        "x": context.scene.tsr_x,
+        "y": context.scene.tsr_y,
+    }
+    object_description["frames"] = frame_descriptions(
+        context, range(context.scene.tsr_frame_range_start, context.scene.tsr_frame_range_end + 1)
+    )
 
     source_directory = bpy.path.abspath("//")
     object_name = bpy.path.display_name_from_filepath(bpy.context.blend_data.filepath)
@@ -786,54 +3357,109 @@ def write_object_description(context):
         json.dump(object_description, file, ensure_ascii=False, indent=2)
 
 
-def split_frames(self, context, source_directory, object_name, variant):
-    write_object_description(context)
-
+def split_command(context, source_directory, object_name, variant):
     compiler_path = bpy.path.abspath(context.preferences.addons["render_ts1"].preferences.compiler_path)
 
     if variant is None:
-        result = subprocess.run(
-            [
-                compiler_path,
-                "split",
-                source_directory,
-                object_name,
-            ],
-            capture_output=True,
-            text=True,
-        )
-        if result.stderr != "":
-            self.report({'ERROR'}, "[Split] " + result.stderr)
-            return False
-    else:
-        result = subprocess.run(
-            [
-                compiler_path,
-                "split",
-                source_directory,
-                object_name,
-                "-v",
-                variant,
-            ],
-            capture_output=True,
-            text=True,
-        )
-        if result.stderr != "":
-            self.report({'ERROR'}, "[Split] " + result.stderr)
-            return False
+        return [
+            compiler_path,
+            "split",
+            source_directory,
+            object_name,
+        ]
+
+    return [
+        compiler_path,
+        "split",
+        source_directory,
+        object_name,
+        "-v",
+        variant,
+    ]
+
+
+def prepare_split(context, source_directory, object_name, variant):
+    # the object description has to be written before, it is shared by every variant
+    full_sprites_name = object_name if variant is None else object_name + " - " + variant
+    with timing.stage("split_prepare", variant=variant):
+        uncrop_full_sprites(context, source_directory + full_sprites_name + " - full sprites/")
 
+
+def run_compiler_command(command):
+    with timing.stage("compiler", command=command[1]):
+        return subprocess.run(command, capture_output=True, text=True)
+
+
+def run_compiler_commands(context, commands):
+    # the compiler runs are independent, the results are in the order of the commands
+    with concurrent.futures.ThreadPoolExecutor(max_workers=context.scene.tsr_compiler_processes) as executor:
+        return list(executor.map(run_compiler_command, commands))
+
+
+def report_compiler_errors(report, prefix, variants, stderrs):
+    errors = list()
+    for variant, stderr in zip(variants, stderrs):
+        if stderr == "":
+            continue
+        errors.append(stderr if variant is None else variant + ": " + stderr)
+
+    if len(errors) > 0:
+        report({'ERROR'}, prefix + "\n".join(errors))
+        return False
     return True
 
 
-def split(self, context):
+def start_split(context, source_directory, object_name, variant):
+    prepare_split(context, source_directory, object_name, variant)
+
+    # stderr goes to a file so a chatty compiler can not block on a full pipe
+    stderr_file = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+    process = subprocess.Popen(
+        split_command(context, source_directory, object_name, variant),
+        stdout=subprocess.DEVNULL,
+        stderr=stderr_file,
+        text=True,
+    )
+    return {"variant": variant, "process": process, "stderr": stderr_file, "start_time": time.perf_counter()}
+
+
+def finish_splits(report, splits):
+    stderrs = list()
+    for started_split in splits:
+        started_split["process"].wait()
+        timing.record("compiler", time.perf_counter() - started_split["start_time"], command="split", pipelined=True)
+        started_split["stderr"].seek(0)
+        stderrs.append(started_split["stderr"].read())
+        started_split["stderr"].close()
+    return report_compiler_errors(report, "[Split] ", [started_split["variant"] for started_split in splits], stderrs)
+
+
+def cancel_splits(splits):
+    for started_split in splits:
+        started_split["process"].terminate()
+        started_split["process"].wait()
+        started_split["stderr"].close()
+
+
+def is_pipeline_split_enabled(context):
+    compiler_path = bpy.path.abspath(context.preferences.addons["render_ts1"].preferences.compiler_path)
+    return (
+        context.scene.tsr_auto_split
+        and context.scene.tsr_pipeline_split
+        and context.scene.tsr_render_processes == 1
+        and os.path.isfile(compiler_path)
+    )
+
+
+def split(report, context, started_splits=()):
     if bpy.path.display_name_from_filepath(context.blend_data.filepath) == "":
-        self.report({'ERROR'}, "Please save your blend file")
+        report({'ERROR'}, "Please save your blend file")
         return {'FINISHED'}
 
     compiler_path = bpy.path.abspath(context.preferences.addons["render_ts1"].preferences.compiler_path)
 
     if os.path.isfile(compiler_path) is False:
-        self.report({'ERROR'}, "Please set the path to the compiler in the add-on preferences")
+        report({'ERROR'}, "Please set the path to the compiler in the add-on preferences")
         return {'FINISHED'}
 
     source_directory = bpy.path.abspath("//")
@@ -841,6 +3467,11 @@ def split(self, context):
 
     auto_continue = True
 
+    # variants split while rendering are only waited for
+    started_variants = [started_split["variant"] for started_split in started_splits]
+
+    variants = list()
+
     if is_gltf_variants_enabled(context) and len(context.scene.gltf2_KHR_materials_variants_variants) > 0:
         if context.scene.gltf2_active_variant >= len(context.scene.gltf2_KHR_materials_variants_variants):
             context.scene.gltf2_active_variant = len(context.scene.gltf2_KHR_materials_variants_variants) - 1
@@ -848,23 +3479,36 @@ def split(self, context):
         for variant in context.scene.gltf2_KHR_materials_variants_variants:
             if not context.scene.tsr_render_all_variants and variant.variant_idx != context.scene.gltf2_active_variant:
                 continue
-            result = split_frames(self, context, source_directory, blender_file_name, variant.name)
-            if not result:
-                auto_continue = False
+            if variant.name in started_variants:
+                continue
+            variants.append(variant.name)
 
-    else:
-        result = split_frames(self, context, source_directory, blender_file_name, None)
-        if not result:
+    elif None not in started_variants:
+        variants.append(None)
+
+    if len(variants) > 0:
+        write_object_description(context)
+        for variant in variants:
+            prepare_split(context, source_directory, blender_file_name, variant)
+
+        results = run_compiler_commands(
+            context,
+            [split_command(context, source_directory, blender_file_name, variant) for variant in variants],
+        )
+        if not report_compiler_errors(report, "[Split] ", variants, [result.stderr for result in results]):
             auto_continue = False
 
+    if not finish_splits(report, started_splits):
+        auto_continue = False
+
     if context.scene.tsr_auto_update_xml and auto_continue:
-        update_xml(self, context)
+        update_xml(report, context)
 
     elif context.scene.tsr_auto_compile and auto_continue:
         if context.scene.tsr_use_advanced_compile:
-            compile_advanced(self, context)
+            compile_advanced(report, context)
         else:
-            compile(self, context)
+            compile(report, context)
 
 
 class TS1R_OT_split(bpy.types.Operator):
@@ -875,20 +3519,24 @@ class TS1R_OT_split(bpy.types.Operator):
     bl_options = {'REGISTER'}
 
     def execute(self, context):
-        split(self, context)
+        log = begin_timing_log(context)
+        try:
+            split(self.report, context)
+        finally:
+            end_timing_log(self.report, log)
 
         return {'FINISHED'}
 
 
-def update_xml(self, context):
+def update_xml(report, context):
     if bpy.path.display_name_from_filepath(context.blend_data.filepath) == "":
-        self.report({'ERROR'}, "Please save your blend file")
+        report({'ERROR'}, "Please save your blend file")
         return {'FINISHED'}
 
     compiler_path = bpy.path.abspath(context.preferences.addons["render_ts1"].preferences.compiler_path)
 
     if os.path.isfile(compiler_path) is False:
-        self.report({'ERROR'}, "Please set the path to the compiler in the add-on preferences")
+        report({'ERROR'}, "Please set the path to the compiler in the add-on preferences")
         return {'FINISHED'}
 
     source_directory = bpy.path.abspath("//")
@@ -901,21 +3549,19 @@ def update_xml(self, context):
     auto_continue = True
 
     if variant_name is None:
-        result = subprocess.run(
+        result = run_compiler_command(
             [
                 compiler_path,
                 "update-xml",
                 source_directory,
                 object_name,
-            ],
-            capture_output=True,
-            text=True,
+            ]
         )
         if result.stderr != "":
-            self.report({'ERROR'}, "[Update XML] " + result.stderr)
+            report({'ERROR'}, "[Update XML] " + result.stderr)
             auto_continue = False
     else:
-        result = subprocess.run(
+        result = run_compiler_command(
             [
                 compiler_path,
                 "update-xml",
@@ -923,19 +3569,17 @@ def update_xml(self, context):
                 object_name,
                 "-v",
                 variant_name,
-            ],
-            capture_output=True,
-            text=True,
+            ]
         )
         if result.stderr != "":
-            self.report({'ERROR'}, "[Update XML] " + result.stderr)
+            report({'ERROR'}, "[Update XML] " + result.stderr)
             auto_continue = False
 
     if context.scene.tsr_auto_compile and auto_continue:
         if context.scene.tsr_use_advanced_compile:
-            compile_advanced(self, context)
+            compile_advanced(report, context)
         else:
-            compile(self, context)
+            compile(report, context)
 
 
 class TS1R_OT_update_xml(bpy.types.Operator):
@@ -946,44 +3590,46 @@ class TS1R_OT_update_xml(bpy.types.Operator):
     bl_options = {'REGISTER'}
 
     def execute(self, context):
-        update_xml(self, context)
+        log = begin_timing_log(context)
+        try:
+            update_xml(self.report, context)
+        finally:
+            end_timing_log(self.report, log)
 
         return {'FINISHED'}
 
 
-def compile(self, context):
+def compile(report, context):
     if bpy.path.display_name_from_filepath(context.blend_data.filepath) == "":
-        self.report({'ERROR'}, "Please save your blend file")
+        report({'ERROR'}, "Please save your blend file")
         return {'FINISHED'}
 
     the_sims_path = bpy.path.abspath(context.preferences.addons["render_ts1"].preferences.the_sims_path)
 
     if os.path.isdir(the_sims_path) is False:
-        self.report({'ERROR'}, "Please set the path to The Sims in the add-on preferences")
+        report({'ERROR'}, "Please set the path to The Sims in the add-on preferences")
         return {'FINISHED'}
 
     compiler_path = bpy.path.abspath(context.preferences.addons["render_ts1"].preferences.compiler_path)
 
     if os.path.isfile(compiler_path) is False:
-        self.report({'ERROR'}, "Please set the path to the compiler in the add-on preferences")
+        report({'ERROR'}, "Please set the path to the compiler in the add-on preferences")
         return {'FINISHED'}
 
     source_directory = bpy.path.abspath("//")
     blender_file_name = bpy.path.display_name_from_filepath(context.blend_data.filepath) + ".xml"
     xml_file_path = os.path.join(source_directory, blender_file_name)
 
-    result = subprocess.run(
+    result = run_compiler_command(
         [
             compiler_path,
             "compile",
             the_sims_path,
             xml_file_path,
-        ],
-        capture_output=True,
-        text=True,
+        ]
     )
     if result.stderr != "":
-        self.report({'ERROR'}, "[Compile] " + result.stderr)
+        report({'ERROR'}, "[Compile] " + result.stderr)
 
 
 class TS1R_OT_compile(bpy.types.Operator):
@@ -994,34 +3640,38 @@ class TS1R_OT_compile(bpy.types.Operator):
     bl_options = {'REGISTER'}
 
     def execute(self, context):
-        compile(self, context)
+        log = begin_timing_log(context)
+        try:
+            compile(self.report, context)
+        finally:
+            end_timing_log(self.report, log)
 
         return {'FINISHED'}
 
 
-def compile_advanced(self, context):
+def compile_advanced(report, context):
     if bpy.path.display_name_from_filepath(context.blend_data.filepath) == "":
-        self.report({'ERROR'}, "Please save your blend file")
+        report({'ERROR'}, "Please save your blend file")
         return {'FINISHED'}
 
     the_sims_path = bpy.path.abspath(context.preferences.addons["render_ts1"].preferences.the_sims_path)
 
     if os.path.isdir(the_sims_path) is False:
-        self.report({'ERROR'}, "Please set the path to The Sims in the add-on preferences")
+        report({'ERROR'}, "Please set the path to The Sims in the add-on preferences")
         return {'FINISHED'}
 
     compiler_path = bpy.path.abspath(context.preferences.addons["render_ts1"].preferences.compiler_path)
 
     if os.path.isfile(compiler_path) is False:
-        self.report({'ERROR'}, "Please set the path to the compiler in the add-on preferences")
+        report({'ERROR'}, "Please set the path to the compiler in the add-on preferences")
         return {'FINISHED'}
 
     if context.scene.tsr_creator_name == "":
-        self.report({'ERROR'}, "[Compile] Please enter your name")
+        report({'ERROR'}, "[Compile] Please enter your name")
         return {'FINISHED'}
 
     if context.scene.tsr_format_string == "":
-        self.report({'ERROR'}, "[Compile] Please enter a formatting string")
+        report({'ERROR'}, "[Compile] Please enter a formatting string")
         return {'FINISHED'}
 
     source_directory = bpy.path.abspath("//")
@@ -1030,13 +3680,17 @@ def compile_advanced(self, context):
         if context.scene.gltf2_active_variant >= len(context.scene.gltf2_KHR_materials_variants_variants):
             context.scene.gltf2_active_variant = len(context.scene.gltf2_KHR_materials_variants_variants) - 1
 
+        variants = list()
+        commands = list()
+
         for variant in context.scene.gltf2_KHR_materials_variants_variants:
             if not context.scene.tsr_compile_all_variants and variant.variant_idx != context.scene.gltf2_active_variant:
                 continue
 
             first_variant_name = context.scene.gltf2_KHR_materials_variants_variants[0].name
 
-            result = subprocess.run(
+            variants.append(variant.name)
+            commands.append(
                 [
                     compiler_path,
                     "compile-advanced",
@@ -1047,14 +3701,13 @@ def compile_advanced(self, context):
                     bpy.path.display_name_from_filepath(context.blend_data.filepath),
                     first_variant_name,
                     variant.name,
-                ],
-                capture_output=True,
-                text=True,
+                ]
             )
-            if result.stderr != "":
-                self.report({'ERROR'}, "[Compile] " + result.stderr)
+
+        results = run_compiler_commands(context, commands)
+        report_compiler_errors(report, "[Compile] ", variants, [result.stderr for result in results])
     else:
-        result = subprocess.run(
+        result = run_compiler_command(
             [
                 compiler_path,
                 "compile-advanced",
@@ -1063,12 +3716,10 @@ def compile_advanced(self, context):
                 context.scene.tsr_format_string,
                 context.scene.tsr_creator_name,
                 bpy.path.display_name_from_filepath(context.blend_data.filepath),
-            ],
-            capture_output=True,
-            text=True,
+            ]
         )
         if result.stderr != "":
-            self.report({'ERROR'}, "[Compile] " + result.stderr)
+            report({'ERROR'}, "[Compile] " + result.stderr)
 
 
 class TS1R_OT_compile_advanced(bpy.types.Operator):
@@ -1079,7 +3730,11 @@ class TS1R_OT_compile_advanced(bpy.types.Operator):
     bl_options = {'REGISTER'}
 
     def execute(self, context):
-        compile_advanced(self, context)
+        log = begin_timing_log(context)
+        try:
+            compile_advanced(self.report, context)
+        finally:
+            end_timing_log(self.report, log)
 
         return {'FINISHED'}
 
@@ -1106,14 +3761,12 @@ class TS1R_OT_add_rotations(bpy.types.Operator):
         blender_file_name = bpy.path.display_name_from_filepath(context.blend_data.filepath) + ".xml"
         xml_file_path = os.path.join(source_directory, blender_file_name)
 
-        result = subprocess.run(
+        result = run_compiler_command(
             [
                 compiler_path,
                 "add-rotations",
                 xml_file_path,
-            ],
-            capture_output=True,
-            text=True,
+            ]
         )
         if result.stdout != "":
             for line in result.stdout.splitlines():
@@ -1192,12 +3845,54 @@ class TS1R_PT_the_sims_renderer_panel(bpy.types.Panel):
             render_all_variants = self.layout.column(align=True)
             render_all_variants.prop(context.scene, "tsr_render_all_variants")
 
-        render_button = self.layout.column(align=True)
+        render_options_box = self.layout.box()
+        render_options = render_options_box.column(align=True)
+        render_options.prop(context.scene, "tsr_depth_pyramid")
+        render_options.prop(context.scene, "tsr_single_render")
+        capture_in_memory = render_options.row(align=True)
+        capture_in_memory.active = context.scene.tsr_single_render is False
+        capture_in_memory.prop(context.scene, "tsr_capture_in_memory")
+        render_options.prop(context.scene, "tsr_crop_to_border")
+        render_options.prop(context.scene, "tsr_output_profile")
+        if context.scene.tsr_output_profile != 'DEFAULT':
+            render_options.prop(context.scene, "tsr_depth_precision")
+        render_options.prop(context.scene, "tsr_sampling_mode")
+        if context.scene.tsr_sampling_mode != 'SCENE':
+            render_options.prop(context.scene, "tsr_noise_target")
+        if context.scene.tsr_sampling_mode == 'TIME_BUDGET':
+            render_options.prop(context.scene, "tsr_time_budget")
+        render_options.prop(context.scene, "tsr_color_strategy")
+        if context.scene.tsr_color_strategy == 'HALF':
+            render_options.prop(context.scene, "tsr_color_filter_width")
+            render_options.prop(context.scene, "tsr_color_sample_scale")
+            render_options.operator("tsr.compare_color", text="Compare Color")
+        render_options.prop(context.scene, "tsr_precise_border")
+        if context.scene.tsr_precise_border:
+            render_options.prop(context.scene, "tsr_border_padding")
+        render_options.prop(context.scene, "tsr_use_render_cache")
+        render_options.prop(context.scene, "tsr_deduplicate_frames")
+        render_options.prop(context.scene, "tsr_symmetry")
+        render_options.prop(context.scene, "tsr_persistent_data")
+        render_options.prop(context.scene, "tsr_render_processes")
+        render_options.prop(context.scene, "tsr_compiler_processes")
+        render_options.prop(context.scene, "tsr_timing_log")
+        render_options.prop(context.scene, "tsr_history")
+        if context.scene.tsr_history:
+            render_options.operator("tsr.performance_report", text="Performance Report")
+
+        render_button = self.layout.split(factor=0.7)
         render_button.operator("tsr.render", text="Render")
+        render_button.operator("tsr.plan", text="Plan")
+        if context.blend_data.filepath != "" and os.path.isfile(checkpoint_path(context)):
+            resume_button = self.layout.column(align=True)
+            resume_button.operator("tsr.render", text="Resume Render").resume = True
 
         split = self.layout.split(factor=0.7)
         split.operator("tsr.split", text="Split")
         split.prop(context.scene, "tsr_auto_split", text="Auto")
+        if context.scene.tsr_auto_split:
+            pipeline_split = self.layout.column(align=True)
+            pipeline_split.prop(context.scene, "tsr_pipeline_split")
 
         update = self.layout.split(factor=0.7)
         update.operator("tsr.update_xml", text="Update XML")
@@ -1241,6 +3936,9 @@ classes = (
     TS1R_OT_set_view_south_west,
     TS1R_OT_set_render_resolution_and_camera,
     TS1R_OT_render,
+    TS1R_OT_plan,
+    TS1R_OT_performance_report,
+    TS1R_OT_compare_color,
     TS1R_OT_split,
     TS1R_OT_update_xml,
     TS1R_OT_compile,
@@ -1330,12 +4028,200 @@ def register():
         default=0,
     )
 
+    bpy.types.Scene.tsr_depth_pyramid = bpy.props.BoolProperty(
+        name="Depth Pyramid",
+        description="Render the depth once at full size and reduce it for the medium and small sprites instead of rendering each size",
+        default=False,
+        options=set(),
+    )
+    bpy.types.Scene.tsr_single_render = bpy.props.BoolProperty(
+        name="Single Render",
+        description="Render the color, alpha and depth of each rotation in one render using extra depth view layers. The depth sprites are reduced from the 200% depth, which uses the pixel filter width of the color",
+        default=False,
+        options=set(),
+    )
+    bpy.types.Scene.tsr_capture_in_memory = bpy.props.BoolProperty(
+        name="In-Memory Capture",
+        description="Read each render from the viewer and write the color, alpha and depth from the add-on instead of the compositor file outputs. Not used with single render",
+        default=False,
+        options=set(),
+    )
+    bpy.types.Scene.tsr_crop_to_border = bpy.props.BoolProperty(
+        name="Crop To Border",
+        description="Write the renders cropped to the render border with the crop rectangles in a JSON file next to them. They are padded back to the full size before splitting",
+        default=False,
+        options=set(),
+    )
+    bpy.types.Scene.tsr_output_profile = bpy.props.EnumProperty(
+        name="Output Profile",
+        description="How the intermediate color, alpha and depth images are stored. The compiler has to be able to read single channel EXR for the compact profiles",
+        items=[
+            ('DEFAULT', "Default", "RGB full float EXR and the default PNG compression"),
+            ('COMPACT', "Compact", "Single channel ZIP compressed EXR with half float alpha"),
+            ('FAST', "Fast", "Single channel uncompressed EXR with half float alpha and uncompressed PNG"),
+        ],
+        default='DEFAULT',
+        options=set(),
+    )
+    bpy.types.Scene.tsr_depth_precision = bpy.props.EnumProperty(
+        name="Depth Precision",
+        description="Precision of the depth EXR with the compact profiles",
+        items=[
+            ('32', "Full Float", "32 bit float depth"),
+            ('16', "Half Float", "16 bit float depth. The background of the z pass is too far for half float"),
+        ],
+        default='32',
+        options=set(),
+    )
+    bpy.types.Scene.tsr_sampling_mode = bpy.props.EnumProperty(
+        name="Sampling",
+        description="How the samples of the color render of each rotation are chosen. Not used with single render",
+        items=[
+            ('SCENE', "Scene", "Use the Cycles sampling settings of the scene"),
+            (
+                'NOISE_TARGET',
+                "Noise Target",
+                "Sample adaptively until the noise target is reached, up to the scene samples",
+            ),
+            (
+                'TIME_BUDGET',
+                "Time Budget",
+                "Sample adaptively to the noise target with as many samples as a quick probe render estimates fit in the time budget, up to the scene samples",
+            ),
+        ],
+        default='SCENE',
+        options=set(),
+    )
+    bpy.types.Scene.tsr_noise_target = bpy.props.FloatProperty(
+        name="Noise Target",
+        description="Adaptive sampling noise threshold of the color render",
+        default=0.02,
+        min=0.001,
+        max=1.0,
+        precision=3,
+        options=set(),
+    )
+    bpy.types.Scene.tsr_time_budget = bpy.props.FloatProperty(
+        name="Time Budget",
+        description="Seconds to spend on the color render of each rotation, including two short probe renders that measure the cost of a sample",
+        default=10.0,
+        min=0.1,
+        subtype='TIME_ABSOLUTE',
+        unit='TIME_ABSOLUTE',
+        options=set(),
+    )
+    bpy.types.Scene.tsr_color_strategy = bpy.props.EnumProperty(
+        name="Color Resolution",
+        description="Resolution the color and alpha are rendered at. Not used with single render",
+        items=[
+            ('FULL', "200%", "Render the color at 200% and let the compiler reduce it to the sprite sizes"),
+            ('HALF', "100%", "Render the color at 100% with a wider pixel filter and scale it up for the compiler"),
+        ],
+        default='FULL',
+        options=set(),
+    )
+    bpy.types.Scene.tsr_color_filter_width = bpy.props.FloatProperty(
+        name="Color Filter Width",
+        description="Pixel filter width of the 100% color render. The 200% render with the default filter reduced by the compiler is about 1.25 pixels wide",
+        default=1.25,
+        min=0.01,
+        max=10.0,
+        subtype='PIXEL',
+        options=set(),
+    )
+    bpy.types.Scene.tsr_color_sample_scale = bpy.props.FloatProperty(
+        name="Color Sample Scale",
+        description="Multiplier of the scene samples for the 100% color render. At 4 each sprite pixel gets as many samples as at 200%",
+        default=1.0,
+        min=0.25,
+        max=4.0,
+        options=set(),
+    )
+    bpy.types.Scene.tsr_precise_border = bpy.props.BoolProperty(
+        name="Precise Border",
+        description="Fit the render border to the evaluated geometry, including instances, instead of the objects bounding boxes. The viewport modifiers and subdivision levels are set to the render ones while rendering",
+        default=False,
+        options=set(),
+    )
+    bpy.types.Scene.tsr_border_padding = bpy.props.IntProperty(
+        name="Border Padding",
+        description="Padding around the precise render border in pixels of the large sprite",
+        default=4,
+        min=0,
+        max=64,
+        options=set(),
+    )
+    bpy.types.Scene.tsr_use_render_cache = bpy.props.BoolProperty(
+        name="Render Cache",
+        description="Only render frames and rotations whose scene, materials or render settings changed since they were last rendered",
+        default=False,
+        options=set(),
+    )
+    bpy.types.Scene.tsr_deduplicate_frames = bpy.props.BoolProperty(
+        name="Deduplicate Frames",
+        description="Render frames that are identical to an earlier frame only once and copy the renders to the others",
+        default=False,
+        options=set(),
+    )
+    bpy.types.Scene.tsr_symmetry = bpy.props.EnumProperty(
+        name="Symmetry",
+        description="Copy the renders of rotations that look the same instead of rendering them",
+        items=[
+            ('NONE', "None", "Render every rotation"),
+            ('AUTO', "Auto", "Detect the symmetry from the geometry, materials, UVs and lights of each frame"),
+            ('ROTATE_180', "180°", "The object looks the same when rotated 180 degrees"),
+            ('ROTATE_90', "90°", "The object looks the same when rotated 90 degrees"),
+        ],
+        default='NONE',
+        options=set(),
+    )
+    bpy.types.Scene.tsr_persistent_data = bpy.props.BoolProperty(
+        name="Persistent Data",
+        description="Keep the scene data and BVH in memory between the renders, render the depth of every rotation of a frame before the color and report the scene sync time against the sampling time",
+        default=False,
+        options=set(),
+    )
+    bpy.types.Scene.tsr_timing_log = bpy.props.BoolProperty(
+        name="Timing Log",
+        description="Append the time and bytes written of every stage of the render, split and compile to a JSON lines file next to the blend file and print a summary table at the end",
+        default=False,
+        options=set(),
+    )
+    bpy.types.Scene.tsr_history = bpy.props.BoolProperty(
+        name="Performance History",
+        description="Record the time of every job and the scene size of every render in a database of past runs, to report regressions and estimate the remaining time",
+        default=False,
+        options=set(),
+    )
+    bpy.types.Scene.tsr_render_processes = bpy.props.IntProperty(
+        name="Render Processes",
+        description="Number of background Blender processes to render with. The CPU threads are divided between them",
+        default=1,
+        min=1,
+        max=64,
+        options=set(),
+    )
+
     bpy.types.Scene.tsr_auto_split = bpy.props.BoolProperty(
         name="Auto Split",
         description="Automatically split after rendering",
         default=False,
         options=set(),
     )
+    bpy.types.Scene.tsr_pipeline_split = bpy.props.BoolProperty(
+        name="Split While Rendering",
+        description="Split each variant in the background as soon as all of its frames are rendered while the next variant renders. Not used with multiple render processes",
+        default=False,
+        options=set(),
+    )
+    bpy.types.Scene.tsr_compiler_processes = bpy.props.IntProperty(
+        name="Compiler Processes",
+        description="Number of compiler processes to split and compile variants with at the same time",
+        default=4,
+        min=1,
+        max=64,
+        options=set(),
+    )
     bpy.types.Scene.tsr_auto_update_xml = bpy.props.BoolProperty(
         name="Auto Update XML",
         description="Automatically update xml after splitting",
@@ -1405,7 +4291,31 @@ def unregister():
 
     del bpy.types.Scene.tsr_palette_id
 
+    del bpy.types.Scene.tsr_depth_pyramid
+    del bpy.types.Scene.tsr_single_render
+    del bpy.types.Scene.tsr_capture_in_memory
+    del bpy.types.Scene.tsr_crop_to_border
+    del bpy.types.Scene.tsr_output_profile
+    del bpy.types.Scene.tsr_depth_precision
+    del bpy.types.Scene.tsr_sampling_mode
+    del bpy.types.Scene.tsr_noise_target
+    del bpy.types.Scene.tsr_time_budget
+    del bpy.types.Scene.tsr_color_strategy
+    del bpy.types.Scene.tsr_color_filter_width
+    del bpy.types.Scene.tsr_color_sample_scale
+    del bpy.types.Scene.tsr_precise_border
+    del bpy.types.Scene.tsr_border_padding
+    del bpy.types.Scene.tsr_use_render_cache
+    del bpy.types.Scene.tsr_deduplicate_frames
+    del bpy.types.Scene.tsr_symmetry
+    del bpy.types.Scene.tsr_persistent_data
+    del bpy.types.Scene.tsr_timing_log
+    del bpy.types.Scene.tsr_history
+    del bpy.types.Scene.tsr_render_processes
+
     del bpy.types.Scene.tsr_auto_split
+    del bpy.types.Scene.tsr_pipeline_split
+    del bpy.types.Scene.tsr_compiler_processes
     del bpy.types.Scene.tsr_auto_update_xml
     del bpy.types.Scene.tsr_auto_compile
 
@@ -0,0 +1,140 @@
+"""Run the render, split and compile chain on a directory of blend files without the UI.
+
+blender --background --addons render_ts1 --python-expr "import render_ts1.batch; render_ts1.batch.main()" -- <directory> [options]
+
+The exit code is 0 if every blend file succeeded, 1 if any failed and 2 for invalid arguments.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+
+import bpy
+
+from . import plan_render
+from . import render
+
+
+class Report:
+    """Collects the messages the pipeline functions report instead of an operator."""
+
+    def __init__(self):
+        self.messages = list()
+
+    def __call__(self, report_type, message):
+        report_type = next(iter(report_type))
+        self.messages.append({"type": report_type, "message": message})
+        print("[{}] {}".format(report_type, message), file=sys.stderr if report_type == 'ERROR' else sys.stdout)
+
+    def errors(self):
+        return [message["message"] for message in self.messages if message["type"] == 'ERROR']
+
+
+def run_blend_file(file_path, auto_update_xml, auto_compile, plan_only=False, resume=False):
+    report = Report()
+    start_time = time.perf_counter()
+    plan = None
+
+    # a broken blend file fails on its own and the rest of the directory still runs
+    try:
+        bpy.ops.wm.open_mainfile(filepath=file_path)
+        context = bpy.context
+
+        if context.scene.objects.get("The Sims Rotation Origin") is None:
+            report({'ERROR'}, "The Sims Renderer has not been set up in this blend file")
+        else:
+            context.scene.tsr_auto_split = True
+            if auto_update_xml is not None:
+                context.scene.tsr_auto_update_xml = auto_update_xml
+            if auto_compile is not None:
+                context.scene.tsr_auto_compile = auto_compile
+
+            if plan_only:
+                plan = plan_render(context)
+                for problem in plan["problems"]:
+                    report({'WARNING'}, problem)
+            else:
+                render(report, context, resume)
+    except Exception:
+        report({'ERROR'}, traceback.format_exc())
+
+    errors = report.errors()
+
+    result = {
+        "file": file_path,
+        "success": len(errors) == 0,
+        "seconds": time.perf_counter() - start_time,
+        "errors": errors,
+        "messages": report.messages,
+    }
+    if plan is not None:
+        result["plan"] = plan
+    return result
+
+
+def run_directory(directory, auto_update_xml=None, auto_compile=None, plan_only=False, resume=False):
+    file_names = sorted(file_name for file_name in os.listdir(directory) if file_name.lower().endswith(".blend"))
+    return [
+        run_blend_file(os.path.join(directory, file_name), auto_update_xml, auto_compile, plan_only, resume)
+        for file_name in file_names
+    ]
+
+
+def main():
+    arguments = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else list()
+
+    parser = argparse.ArgumentParser(prog="render_ts1.batch", description=__doc__.splitlines()[0])
+    parser.add_argument("directory", help="Directory of blend files to render")
+    parser.add_argument("--results", help="Write the results as JSON to this file instead of stdout")
+    parser.add_argument("--compiler", help="Path to the TS1 Compiler, overriding the add-on preferences")
+    parser.add_argument("--the-sims", help="Path to The Sims, overriding the add-on preferences")
+    parser.add_argument(
+        "--update-xml",
+        action=argparse.BooleanOptionalAction,
+        help="Update the XML after splitting, defaults to each blend files setting",
+    )
+    parser.add_argument(
+        "--compile",
+        action=argparse.BooleanOptionalAction,
+        help="Compile after splitting, defaults to each blend files setting",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the jobs an interrupted render of each blend file completed",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Only plan the render of each blend file and include the jobs and problems in the results",
+    )
+
+    try:
+        arguments = parser.parse_args(arguments)
+    except SystemExit:
+        sys.exit(2)
+
+    if os.path.isdir(arguments.directory) is False:
+        print("{} is not a directory".format(arguments.directory), file=sys.stderr)
+        sys.exit(2)
+
+    preferences = bpy.context.preferences.addons["render_ts1"].preferences
+    if arguments.compiler is not None:
+        preferences.compiler_path = arguments.compiler
+    if arguments.the_sims is not None:
+        preferences.the_sims_path = arguments.the_sims
+
+    results = run_directory(
+        arguments.directory, arguments.update_xml, arguments.compile, arguments.plan, arguments.resume
+    )
+
+    if arguments.results is not None:
+        with open(arguments.results, "w", encoding="utf-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+
+    sys.exit(0 if all(result["success"] for result in results) else 1)
@@ -0,0 +1,323 @@
+"""Render synthetic sprite scenes and report the time spent in each stage as JSON.
+
+blender --background --factory-startup --addons render_ts1 --python-expr "import render_ts1.benchmark; render_ts1.benchmark.main()" -- [options]
+
+The scenes are rendered with CPU Cycles at a low sample count into a temporary directory and split with a stub
+compiler that does nothing, so only the time spent by the add-on and Blender is measured.
+The stages can be nested, a color render includes the file moves it does.
+Every scene is rendered once per output profile, with the seconds and bytes written of each rotation.
+Each scene is rendered in a Blender process of its own, so its peak memory is not that of an earlier scene.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import bmesh
+import bpy
+
+from . import bl_info
+from . import timing
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+SCENES = ["footprint_1x1", "footprint_4x4", "footprint_16x2", "animation_64", "variants_10", "kitbash_5000"]
+OUTPUT_PROFILES = ["DEFAULT", "COMPACT", "FAST"]
+
+
+class StageTimes:
+    """Sums the seconds and count of every stage and the seconds and bytes written of every rotation."""
+
+    def __init__(self):
+        self.stages = dict()
+        self.rotations = dict()
+
+    def __call__(self, name, seconds, fields):
+        if "job" in fields:
+            rotation = self.rotations.setdefault(
+                fields["job"],
+                {
+                    "variant": fields["variant"],
+                    "frame": fields["frame"],
+                    "direction": fields["direction"],
+                    "seconds": 0.0,
+                    "bytes": 0,
+                },
+            )
+            if name == "rotation":
+                rotation["seconds"] += seconds
+            elif name in ("file_move", "file_write"):
+                rotation["bytes"] += fields.get("bytes", 0)
+
+        if name == "depth":
+            name += "_" + fields["size"] + ("_extra" if fields["extra"] else "")
+        elif name == "compiler":
+            name += "_" + fields["command"]
+        stage = self.stages.setdefault(name, {"count": 0, "seconds": 0.0})
+        stage["count"] += 1
+        stage["seconds"] += seconds
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes and macos bytes
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def directory_bytes(directory, excluded_extensions=(".blend", ".blend1")):
+    total = 0
+    for root, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            if file_name.endswith(excluded_extensions) is False:
+                total += os.path.getsize(os.path.join(root, file_name))
+    return total
+
+
+def write_stub_compiler(directory):
+    if sys.platform == "win32":
+        compiler_path = os.path.join(directory, "stub compiler.bat")
+        with open(compiler_path, "w", encoding="utf-8") as file:
+            file.write("@exit /b 0\n")
+    else:
+        compiler_path = os.path.join(directory, "stub compiler")
+        with open(compiler_path, "w", encoding="utf-8") as file:
+            file.write("#!/bin/sh\nexit 0\n")
+        os.chmod(compiler_path, 0o755)
+    return compiler_path
+
+
+def add_box(name, mesh, location, dimensions):
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    obj.location = location
+    obj.scale = dimensions
+    return obj
+
+
+def box_mesh(name):
+    mesh = bpy.data.meshes.new(name)
+    bm = bmesh.new()
+    bmesh.ops.create_cube(bm, size=1.0)
+    bm.to_mesh(mesh)
+    bm.free()
+    return mesh
+
+
+def new_scene(file_path, x, y, samples):
+    bpy.ops.wm.read_homefile(use_empty=True)
+    scene = bpy.context.scene
+
+    scene.render.engine = 'CYCLES'
+    scene.cycles.device = 'CPU'
+    scene.cycles.samples = samples
+    scene.tsr_x = x
+    scene.tsr_y = y
+
+    sun = bpy.data.objects.new("Sun", bpy.data.lights.new("Sun", 'SUN'))
+    scene.collection.objects.link(sun)
+    sun.rotation_euler = (math.radians(45), 0, math.radians(30))
+
+    bpy.ops.wm.save_as_mainfile(filepath=file_path)
+    bpy.ops.tsr.setup()
+    return scene
+
+
+def build_footprint(file_path, x, y, samples):
+    new_scene(file_path, x, y, samples)
+    add_box("Object", box_mesh("Object"), (0, 0, 0.5), (x * 0.9, y * 0.9, 1))
+
+
+def build_animation(file_path, samples):
+    scene = new_scene(file_path, 1, 1, samples)
+    scene.frame_end = 64
+    obj = add_box("Object", box_mesh("Object"), (0, 0, 0.5), (0.6, 0.3, 1))
+    obj.rotation_euler = (0, 0, 0)
+    obj.keyframe_insert("rotation_euler", frame=1)
+    obj.rotation_euler = (0, 0, math.radians(360))
+    obj.keyframe_insert("rotation_euler", frame=64)
+
+
+def build_variants(file_path, samples):
+    import addon_utils
+
+    addon_utils.enable("io_scene_gltf2", default_set=True)
+    bpy.context.preferences.addons["io_scene_gltf2"].preferences.KHR_materials_variants_ui = True
+
+    scene = new_scene(file_path, 1, 1, samples)
+    if hasattr(scene, "gltf2_KHR_materials_variants_variants") is False:
+        return False
+
+    scene.tsr_render_all_variants = True
+    obj = add_box("Object", box_mesh("Object"), (0, 0, 0.5), (0.9, 0.9, 1))
+    obj.data.materials.append(None)
+
+    for variant_idx in range(10):
+        variant = scene.gltf2_KHR_materials_variants_variants.add()
+        variant.variant_idx = variant_idx
+        variant.name = "Color {}".format(variant_idx)
+
+        material = bpy.data.materials.new(variant.name)
+        material.diffuse_color = (variant_idx / 10, 0.5, 1 - variant_idx / 10, 1)
+
+        primitive = obj.data.gltf2_variant_mesh_data.add()
+        primitive.material_slot_index = 0
+        primitive.material = material
+        primitive.variants.add().variant.variant_idx = variant_idx
+
+    return True
+
+
+def build_kitbash(file_path, samples):
+    new_scene(file_path, 4, 4, samples)
+    generator = random.Random(0)
+    mesh = box_mesh("Part")
+    for index in range(5000):
+        add_box(
+            "Part {}".format(index),
+            mesh,
+            (generator.uniform(-1.8, 1.8), generator.uniform(-1.8, 1.8), generator.uniform(0.05, 3)),
+            (generator.uniform(0.02, 0.2), generator.uniform(0.02, 0.2), generator.uniform(0.02, 0.2)),
+        )
+
+
+def run_scene(name, directory, samples, output_profile, compiler_path):
+    file_path = os.path.join(directory, output_profile.lower(), name, name + ".blend")
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    if name == "footprint_1x1":
+        build_footprint(file_path, 1, 1, samples)
+    elif name == "footprint_4x4":
+        build_footprint(file_path, 4, 4, samples)
+    elif name == "footprint_16x2":
+        build_footprint(file_path, 16, 2, samples)
+    elif name == "animation_64":
+        build_animation(file_path, samples)
+    elif name == "variants_10":
+        if build_variants(file_path, samples) is False:
+            return {
+                "scene": name,
+                "output_profile": output_profile,
+                "skipped": "glTF material variants are not available",
+            }
+    elif name == "kitbash_5000":
+        build_kitbash(file_path, samples)
+
+    bpy.context.preferences.addons["render_ts1"].preferences.compiler_path = compiler_path
+    bpy.context.scene.tsr_auto_split = True
+    bpy.context.scene.tsr_output_profile = output_profile
+    bpy.ops.wm.save_mainfile()
+
+    stage_times = StageTimes()
+    timing.listeners.append(stage_times)
+    start_time = time.perf_counter()
+    try:
+        bpy.ops.tsr.render()
+    finally:
+        timing.listeners.remove(stage_times)
+
+    return {
+        "scene": name,
+        "output_profile": output_profile,
+        "x": bpy.context.scene.tsr_x,
+        "y": bpy.context.scene.tsr_y,
+        "frames": bpy.context.scene.frame_end - bpy.context.scene.frame_start + 1,
+        "objects": len(bpy.context.scene.objects),
+        "seconds": time.perf_counter() - start_time,
+        "stages": stage_times.stages,
+        "rotations": list(stage_times.rotations.values()),
+        "bytes_written": directory_bytes(os.path.dirname(file_path)),
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def run_scene_process(name, directory, samples, output_profile, keep_directory):
+    # the peak resident memory is that of the whole process, so every scene gets a process of its own
+    result_path = os.path.join(directory, "{} {}.json".format(output_profile.lower(), name))
+    command = [
+        bpy.app.binary_path,
+        "--background",
+        "--factory-startup",
+        "--addons",
+        "render_ts1",
+        "--python-exit-code",
+        "1",
+        "--python-expr",
+        "import render_ts1.benchmark; render_ts1.benchmark.main()",
+        "--",
+        "--output",
+        result_path,
+        "--samples",
+        str(samples),
+        "--scenes",
+        name,
+        "--output-profiles",
+        output_profile,
+    ]
+    if keep_directory is not None:
+        command += ["--keep", keep_directory]
+
+    process = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if process.returncode != 0 or os.path.isfile(result_path) is False:
+        return {"scene": name, "output_profile": output_profile, "error": process.stderr.strip()}
+
+    with open(result_path, encoding="utf-8") as file:
+        return json.load(file)["scenes"][0]
+
+
+def main():
+    arguments = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else list()
+
+    parser = argparse.ArgumentParser(prog="render_ts1.benchmark", description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="Write the results as JSON to this file instead of stdout")
+    parser.add_argument("--samples", type=int, default=4, help="Cycles samples of the color render")
+    parser.add_argument("--scenes", nargs="+", choices=SCENES, default=SCENES, help="Scenes to render")
+    parser.add_argument(
+        "--output-profiles",
+        nargs="+",
+        choices=OUTPUT_PROFILES,
+        default=OUTPUT_PROFILES,
+        help="Output profiles to render every scene with",
+    )
+    parser.add_argument("--keep", help="Render into this directory and keep the renders")
+
+    try:
+        arguments = parser.parse_args(arguments)
+    except SystemExit:
+        sys.exit(2)
+
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        directory = arguments.keep if arguments.keep is not None else temporary_directory
+        compiler_path = write_stub_compiler(temporary_directory)
+
+        results = {
+            "blender": bpy.app.version_string,
+            "add_on": ".".join(str(number) for number in bl_info["version"]),
+            "samples": arguments.samples,
+        }
+
+        runs = [(output_profile, name) for output_profile in arguments.output_profiles for name in arguments.scenes]
+        if len(runs) == 1:
+            results["scenes"] = [run_scene(runs[0][1], directory, arguments.samples, runs[0][0], compiler_path)]
+        else:
+            results["scenes"] = [
+                run_scene_process(name, temporary_directory, arguments.samples, output_profile, arguments.keep)
+                for output_profile, name in runs
+            ]
+
+    if arguments.output is not None:
+        with open(arguments.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
@@ -0,0 +1,173 @@
+"""History of the render runs in a local SQLite database, to find regressions and estimate the cost of a job.
+
+A job is the render of one rotation of one frame of one variant, its seconds are the sum of its rotation stages.
+"""
+
+import contextlib
+import sqlite3
+import statistics
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    object TEXT NOT NULL,
+    blend TEXT NOT NULL,
+    blender TEXT NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    objects INTEGER NOT NULL,
+    triangles INTEGER NOT NULL,
+    texture_bytes INTEGER NOT NULL,
+    variants INTEGER NOT NULL,
+    frames INTEGER NOT NULL,
+    rotations INTEGER NOT NULL,
+    seconds REAL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    run INTEGER NOT NULL REFERENCES runs (id),
+    job TEXT NOT NULL,
+    variant TEXT,
+    frame INTEGER NOT NULL,
+    direction TEXT NOT NULL,
+    rotation REAL NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run INTEGER NOT NULL REFERENCES runs (id),
+    stage TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    bytes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_run ON jobs (run);
+CREATE INDEX IF NOT EXISTS stages_run ON stages (run);
+"""
+
+# render workers write to the same database, so wait for their locks instead of failing
+TIMEOUT = 60
+
+
+@contextlib.contextmanager
+def connect(file_path):
+    connection = sqlite3.connect(file_path, timeout=TIMEOUT)
+    try:
+        connection.executescript(SCHEMA)
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+class Recorder:
+    """Collects the jobs and stage totals of a run until they are saved."""
+
+    def __init__(self):
+        self.jobs = dict()
+        self.stages = dict()
+        # the compile and split threads record their stages too
+        self.lock = threading.Lock()
+
+    def __call__(self, name, seconds, fields):
+        with self.lock:
+            # with persistent data a job is rendered in two rotation stages, the depth and the color
+            if name == "rotation":
+                key = (fields["job"], fields["variant"], fields["frame"], fields["direction"], fields["rotation"])
+                self.jobs[key] = self.jobs.get(key, 0.0) + seconds
+
+            stage = self.stages.setdefault(name, [0, 0.0, 0])
+            stage[0] += 1
+            stage[1] += seconds
+            stage[2] += fields.get("bytes", 0)
+
+    def save(self, file_path, run):
+        with self.lock:
+            jobs = [(run, *key, seconds) for key, seconds in self.jobs.items()]
+            stages = [(run, name, *stage) for name, stage in self.stages.items()]
+
+        with connect(file_path) as connection:
+            connection.executemany("INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?)", jobs)
+            connection.executemany("INSERT INTO stages VALUES (?, ?, ?, ?, ?)", stages)
+
+
+def begin_run(file_path, characteristics):
+    with connect(file_path) as connection:
+        cursor = connection.execute(
+            "INSERT INTO runs ("
+            "started, object, blend, blender, x, y, samples, objects, triangles, texture_bytes, variants, frames, rotations"
+            ") VALUES ("
+            ":started, :object, :blend, :blender, :x, :y, :samples, :objects, :triangles, :texture_bytes, :variants, "
+            ":frames, :rotations"
+            ")",
+            {"started": time.time(), **characteristics},
+        )
+        return cursor.lastrowid
+
+
+def end_run(file_path, run, seconds):
+    with connect(file_path) as connection:
+        connection.execute("UPDATE runs SET seconds = ? WHERE id = ?", (seconds, run))
+
+
+def job_seconds(file_path, object_name, x, y, samples, run_count=5):
+    # the mean job of the last runs of the object, or the cost per sample and tile of every object scaled to it
+    with connect(file_path) as connection:
+        rows = connection.execute(
+            "SELECT AVG(jobs.seconds) FROM jobs JOIN runs ON runs.id = jobs.run "
+            "WHERE runs.object = ? AND runs.samples = ? AND runs.seconds IS NOT NULL "
+            "GROUP BY runs.id ORDER BY runs.started DESC LIMIT ?",
+            (object_name, samples, run_count),
+        ).fetchall()
+        if len(rows) > 0:
+            return statistics.mean(row[0] for row in rows)
+
+        rows = connection.execute(
+            "SELECT AVG(jobs.seconds) / (runs.samples * runs.x * runs.y) FROM jobs JOIN runs ON runs.id = jobs.run "
+            "WHERE runs.seconds IS NOT NULL GROUP BY runs.id"
+        ).fetchall()
+        if len(rows) > 0:
+            return statistics.median(row[0] for row in rows) * samples * x * y
+
+    return None
+
+
+def regressions(file_path, days=7, threshold=0.2):
+    # compares the latest run of every object with its runs of the same sample count from before the last days
+    messages = list()
+    since = time.time() - days * 24 * 60 * 60
+
+    with connect(file_path) as connection:
+        latest_runs = connection.execute(
+            "SELECT id, object, samples, MAX(started) FROM runs WHERE seconds IS NOT NULL GROUP BY object"
+        ).fetchall()
+
+        for run, object_name, samples, _ in latest_runs:
+            baseline = dict(
+                connection.execute(
+                    "SELECT jobs.direction, AVG(jobs.seconds) FROM jobs JOIN runs ON runs.id = jobs.run "
+                    "WHERE runs.object = ? AND runs.samples = ? AND runs.started < ? AND runs.seconds IS NOT NULL "
+                    "GROUP BY jobs.direction",
+                    (object_name, samples, since),
+                ).fetchall()
+            )
+            latest = connection.execute(
+                "SELECT direction, AVG(seconds) FROM jobs WHERE run = ? GROUP BY direction ORDER BY direction",
+                (run,),
+            ).fetchall()
+
+            for direction, seconds in latest:
+                baseline_seconds = baseline.get(direction)
+                if baseline_seconds is None or baseline_seconds <= 0:
+                    continue
+                change = seconds / baseline_seconds - 1
+                if change > threshold:
+                    messages.append(
+                        "{} rotation of {} got {:.0%} slower since {} days ago ({:.2f} s to {:.2f} s)".format(
+                            direction, object_name, change, days, baseline_seconds, seconds
+                        )
+                    )
+
+    return messages
@@ -0,0 +1,99 @@
+"""Timing of the stages of the render, split and compile chain.
+
+Nothing is measured until a listener is added, so the stages cost nothing in normal use.
+A listener is called with the stage name, the seconds it took and the fields of the stage.
+Stages can be nested, a color render includes the file moves it does.
+"""
+
+import contextlib
+import json
+import threading
+import time
+
+listeners = list()
+
+# fields of the job being worked on, added to every stage recorded inside it
+job_fields = dict()
+
+
+def record(name, seconds, **fields):
+    for listener in listeners:
+        listener(name, seconds, {**job_fields, **fields})
+
+
+@contextlib.contextmanager
+def stage(name, **fields):
+    # the fields can be added to inside the stage, for example with the bytes written
+    if len(listeners) == 0:
+        yield fields
+        return
+
+    start_time = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        record(name, time.perf_counter() - start_time, **fields)
+
+
+@contextlib.contextmanager
+def job(**fields):
+    previous_fields = dict(job_fields)
+    job_fields.update(fields)
+    try:
+        yield
+    finally:
+        job_fields.clear()
+        job_fields.update(previous_fields)
+
+
+class Log:
+    """Appends every stage as a line of JSON to a file shared by the runs of a blend file."""
+
+    def __init__(self, file_path, run):
+        self.file_path = file_path
+        self.run = run
+        self.lock = threading.Lock()
+        # line buffered so render workers appending to the same file write whole lines
+        self.file = open(file_path, "a", encoding="utf-8", buffering=1)
+
+    def __call__(self, name, seconds, fields):
+        line = json.dumps({"run": self.run, "stage": name, "seconds": round(seconds, 6), **fields}, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+def summary(file_path, run):
+    stages = dict()
+    with open(file_path, encoding="utf-8") as file:
+        for line in file:
+            entry = json.loads(line)
+            if entry["run"] != run:
+                continue
+            stage = stages.setdefault(entry["stage"], {"count": 0, "seconds": 0.0, "bytes": 0})
+            stage["count"] += 1
+            stage["seconds"] += entry["seconds"]
+            stage["bytes"] += entry.get("bytes", 0)
+
+    rows = [("Stage", "Count", "Seconds", "Mean", "MB")]
+    for name, stage in sorted(stages.items(), key=lambda item: item[1]["seconds"], reverse=True):
+        rows.append(
+            (
+                name,
+                str(stage["count"]),
+                "{:.2f}".format(stage["seconds"]),
+                "{:.3f}".format(stage["seconds"] / stage["count"]),
+                "{:.1f}".format(stage["bytes"] / 1e6),
+            )
+        )
+
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    return "\n".join(
+        "  ".join(
+            value.ljust(width) if column == 0 else value.rjust(width)
+            for column, (value, width) in enumerate(zip(row, widths))
+        )
+        for row in rows
+    )